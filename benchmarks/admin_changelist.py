@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Measures rendering of an admin-changelist-like page with TRANZ_REPLACE_DJANGO_TRANSLATIONS = True,
+with and without the flattened "django" domain fast path (Translator.get_flattened_domain()).
+
+    python benchmarks/admin_changelist.py [rows]
+"""
+
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+
+ROW = """<tr>
+  <td><input type="checkbox" title="{% trans "Select this object for an action" %}"></td>
+  <td><a href="#" title="{% trans "Change" %}">{{ row }}</a></td>
+  <td>{% trans "Yes" %}</td><td>{% trans "No" %}</td><td>{% trans "Unknown" %}</td>
+  <td><a href="#">{% trans "Delete" %}</a> <a href="#">{% trans "History" %}</a></td>
+</tr>"""
+
+PAGE = """{% load i18n %}
+<h1>{% trans "Select user to change" %}</h1>
+<form><label>{% trans "Action:" %}</label> <button>{% trans "Go" %}</button>
+<a href="#">{% trans "Select all" %}</a> <a href="#">{% trans "Clear selection" %}</a></form>
+<table>{% for row in rows %}""" + ROW + """{% endfor %}</table>
+<div>{% trans "Filter" %} {% trans "By date" %} {% trans "Any date" %} {% trans "Today" %}</div>"""
+
+
+def child(mode, rows):
+    common.setup_django(TRANZ_REPLACE_DJANGO_TRANSLATIONS=True, LANGUAGES=[("en", "en"), ("fr", "fr")])
+    from django.template import engines
+    from django.utils import translation
+    from django_translate import services
+
+    if mode == "trans":
+        # Every lookup goes through Translator.trans(), as it did before the fast path existed
+        services.translator.get_flattened_domain = lambda domain, locale: {}
+
+    template = engines["django"].from_string(PAGE)
+    context = {"rows": list(range(int(rows)))}
+    messages = ["Yes", "No", "Unknown", "Change", "Delete", "History", "Select all", "Go"]
+
+    with translation.override("fr"):
+        template.render(context)
+        render = common.best_of(lambda: template.render(context), number=20)
+        gettext = common.best_of(lambda: [translation.ugettext(m) for m in messages], number=10000) / len(messages)
+
+    print(json.dumps({"render": render, "gettext": gettext}))
+
+
+def main(rows=100):
+    print("{0} rows".format(rows))
+    print("{0:<12}{1:>16}{2:>16}".format("mode", "render [ms]", "ugettext [us]"))
+    for mode in ["trans", "flattened"]:
+        result = common.run_isolated(__file__, "--child", mode, rows)
+        print("{0:<12}{1:>16.2f}{2:>16.2f}".format(mode, result["render"] / 1000, result["gettext"]))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        child(*sys.argv[2:])
+    else:
+        main(*[int(a) for a in sys.argv[1:]])
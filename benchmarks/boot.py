@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Measures how long it takes for a fresh process to import django_translate.services
+and serve its first translation, and how much memory it uses afterwards.
+
+    python benchmarks/boot.py [locales] [domains] [messages per file]
+"""
+
+import os
+import sys
+import json
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+
+
+MODES = {
+    "eager": {},
+    "lazy": {"TRANZ_LAZY_LOADING": True},
+    "snapshot": {"TRANZ_SNAPSHOT_DIR": "snapshots"},
+    "snapshot+lazy": {"TRANZ_SNAPSHOT_DIR": "snapshots", "TRANZ_LAZY_LOADING": True},
+}
+
+
+def child(path, mode):
+    options = dict(MODES[mode])
+    if "TRANZ_SNAPSHOT_DIR" in options:
+        options["TRANZ_SNAPSHOT_DIR"] = os.path.join(path, options["TRANZ_SNAPSHOT_DIR"])
+
+    rss_before = common.rss()
+    # django_translate.models imports services, so django.setup() is a part of the boot
+    import_time, _ = common.timed(common.setup_django, TRANZ_LOCALE_PATHS=[path], **options)
+    from django_translate import services
+
+    first_time, _ = common.timed(services.trans, "messages.message_1", {"name": "Adam"}, "messages", "fr")
+    print(json.dumps({
+        "boot": import_time,
+        "first_trans": first_time,
+        "rss": common.rss() - rss_before,
+    }))
+
+
+def compile_snapshots(path):
+    common.setup_django(TRANZ_LOCALE_PATHS=[path])
+    from django.core.management import call_command
+    call_command("tranzcompile", output_dir=os.path.join(path, "snapshots"))
+    print("{}")
+
+
+def main(locales=40, domains=5, messages=1000):
+    path = os.path.join(tempfile.gettempdir(), "django_translate_bench_{0}_{1}_{2}".format(locales, domains, messages))
+    common.generate_catalogues(path, common.LOCALES[:locales], ["messages", "admin", "forms", "emails", "blog"][:domains], messages)
+
+    common.run_isolated(__file__, "--compile", path)
+
+    print("{0} locales, {1} domains, {2} messages per file".format(locales, domains, messages))
+    print("{0:<14}{1:>14}{2:>18}{3:>14}".format("mode", "boot [ms]", "first trans [ms]", "RSS [MB]"))
+    for mode in sorted(MODES):
+        result = common.run_isolated(__file__, "--child", path, mode)
+        print("{0:<14}{1:>14.1f}{2:>18.1f}{3:>14.1f}".format(
+            mode, result["boot"] * 1000, result["first_trans"] * 1000, result["rss"] / 1024.0))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        child(*sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == "--compile":
+        compile_snapshots(*sys.argv[2:])
+    else:
+        main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Helpers shared by benchmark scripts. Benchmarks do not need a django project,
+they configure django on their own using a synthetic set of translation files.
+"""
+
+import os
+import sys
+import time
+import json
+import subprocess
+from collections import OrderedDict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LOCALES = ['en', 'fr', 'de', 'pl', 'es', 'it', 'pt', 'nl', 'sv', 'cs', 'ru', 'uk', 'ja', 'ko', 'zh',
+           'da', 'fi', 'hu', 'ro', 'tr', 'el', 'he', 'ar', 'hi', 'th', 'vi', 'id', 'ms', 'bg', 'hr',
+           'sk', 'sl', 'lt', 'lv', 'et', 'is', 'ga', 'cy', 'mt', 'sq']
+
+
+def generate_catalogues(path, locales, domains, messages, format="yml"):
+    """
+    Writes {domain}.{locale}.{format} files (yml or json), each of them containing `messages` entries
+    """
+    if not os.path.isdir(path):
+        os.makedirs(path)
+
+    for locale in locales:
+        for domain in domains:
+            file = os.path.join(path, "{0}.{1}.{2}".format(domain, locale, format))
+            if os.path.isfile(file):
+                continue
+
+            entries = []
+            for i in range(messages):
+                if i % 10 == 0:
+                    entries.append(("{0}.plural_{1}".format(domain, i),
+                                    "{{0}} none|{{1}} one item {0}|]1,Inf] {{count}} items {0}".format(i)))
+                elif i % 2:
+                    entries.append(("{0}.message_{1}".format(domain, i),
+                                    "Hello {{name}}, this is message {0} in {1}".format(i, locale)))
+                else:
+                    entries.append(("{0}.message_{1}".format(domain, i), "Message {0} in {1}".format(i, locale)))
+
+            with open(file, "w") as f:
+                if format == "json":
+                    json.dump(OrderedDict(entries), f, indent=0)
+                else:
+                    for id, message in entries:
+                        f.write('{0}: "{1}"\n'.format(id, message))
+
+
+def setup_django(**options):
+    """
+    Configures and initializes django for a benchmark
+    """
+    sys.path.insert(0, ROOT)
+
+    import django
+    from django.conf import settings
+
+    defaults = {
+        "INSTALLED_APPS": ["django_translate"],
+        "LANGUAGES": [(l, l) for l in LOCALES],
+        "TEMPLATES": [{"BACKEND": "django.template.backends.django.DjangoTemplates", "DIRS": []}],
+        "TRANZ_SEARCH_LOCALE_IN_APPS": False,
+    }
+    defaults.update(options)
+    settings.configure(**defaults)
+    django.setup()
+
+
+def rss():
+    """
+    @rtype: int
+    @return: Resident set size of current process in kB (linux only)
+    """
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def uss():
+    """
+    @rtype: int
+    @return: Unique set size of current process in kB - memory not shared with any other process (linux only)
+    """
+    path = "/proc/self/smaps_rollup" if os.path.exists("/proc/self/smaps_rollup") else "/proc/self/smaps"
+    total = 0
+    with open(path) as f:
+        for line in f:
+            if line.startswith("Private_Clean:") or line.startswith("Private_Dirty:"):
+                total += int(line.split()[1])
+    return total
+
+
+def timed(fn, *args, **kwargs):
+    start = time.time()
+    result = fn(*args, **kwargs)
+    return time.time() - start, result
+
+
+def best_of(fn, repeat=5, number=1000):
+    """
+    @rtype: float
+    @return: Best time of a single call in microseconds
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        for _ in range(number):
+            fn()
+        elapsed = (time.time() - start) / number * 1e6
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_isolated(script, *args):
+    """
+    Runs a benchmark script in a fresh interpreter (required to measure boot time and memory)
+    and returns whatever it printed as json on the last line of its output
+    """
+    output = subprocess.check_output([sys.executable, script] + [str(a) for a in args])
+    return json.loads(output.decode("utf-8").strip().split("\n")[-1])
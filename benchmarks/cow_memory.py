@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Measures memory used by each worker of a pre-fork server: catalogues are loaded in the parent
+process, workers are forked and look up every message. Memory unique to a worker (USS) is
+what it could not share with the parent, see settings.TRANZ_FREEZE_CATALOGUES.
+
+    python benchmarks/cow_memory.py [workers] [locales] [domains] [messages per file]
+"""
+
+import os
+import gc
+import sys
+import json
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+
+DOMAINS = ["messages", "admin", "forms", "emails", "blog"]
+
+
+def worker(translator, locales, domains, messages, output):
+    for locale in locales:
+        for domain in domains:
+            for i in range(messages):
+                if i % 10:
+                    translator.trans("{0}.message_{1}".format(domain, i), {"name": "Adam"}, domain, locale)
+                else:
+                    translator.transchoice("{0}.plural_{1}".format(domain, i), i, {}, domain, locale)
+    gc.collect()
+    os.write(output, json.dumps({"uss": common.uss()}).encode("utf-8"))
+
+
+def child(path, mode, workers, locales, domains, messages):
+    workers, locales, domains, messages = int(workers), int(locales), int(domains), int(messages)
+    common.setup_django(TRANZ_LOCALE_PATHS=[path], TRANZ_FREEZE_CATALOGUES=(mode == "frozen"))
+    from django_translate import services
+
+    for locale in common.LOCALES[:locales]:
+        services.translator.get_catalogue(locale)
+    parent_rss = common.rss()
+
+    results = []
+    for _ in range(workers):
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            try:
+                worker(services.translator, common.LOCALES[:locales], DOMAINS[:domains], messages, write)
+            finally:
+                os._exit(0)
+        os.close(write)
+        with os.fdopen(read) as f:
+            results.append(json.loads(f.read()))
+        os.waitpid(pid, 0)
+
+    print(json.dumps({
+        "parent_rss": parent_rss,
+        "worker_uss": sum(r["uss"] for r in results) / float(len(results)),
+    }))
+
+
+def main(workers=4, locales=40, domains=5, messages=1000):
+    path = os.path.join(tempfile.gettempdir(), "django_translate_bench_{0}_{1}_{2}".format(locales, domains, messages))
+    common.generate_catalogues(path, common.LOCALES[:locales], DOMAINS[:domains], messages)
+
+    print("{0} workers, {1} locales, {2} domains, {3} messages per file".format(workers, locales, domains, messages))
+    print("{0:<10}{1:>18}{2:>22}".format("mode", "parent RSS [MB]", "USS per worker [MB]"))
+    for mode in ["dict", "frozen"]:
+        result = common.run_isolated(__file__, "--child", path, mode, workers, locales, domains, messages)
+        print("{0:<10}{1:>18.1f}{2:>22.1f}".format(mode, result["parent_rss"] / 1024.0, result["worker_uss"] / 1024.0))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        child(*sys.argv[2:])
+    else:
+        main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the cost of declaring lazy strings (model verbose names, form labels...) at import
+time with TRANZ_REPLACE_DJANGO_TRANSLATIONS = True, and of rendering them afterwards.
+"eager" declares them with ugettext(), which is what ugettext_lazy() used to do.
+
+    python benchmarks/lazy_strings.py [strings]
+"""
+
+import os
+import sys
+import json
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+
+
+def child(path, mode, strings):
+    strings = int(strings)
+    common.setup_django(TRANZ_LOCALE_PATHS=[path], TRANZ_REPLACE_DJANGO_TRANSLATIONS=True)
+    from django.utils import translation
+
+    declare = translation.ugettext if mode == "eager" else translation.ugettext_lazy
+    ids = ["django.message_{0}".format(i * 2 % 1000) for i in range(strings)]
+    import_time, labels = common.timed(lambda: [declare(id) for id in ids])
+
+    def render():
+        with translation.override("fr"):
+            return [str(label) for label in labels]
+
+    first_render, _ = common.timed(render)
+    next_render, _ = common.timed(render)
+    print(json.dumps({"import": import_time, "first_render": first_render, "next_render": next_render}))
+
+
+def main(strings=10000):
+    path = os.path.join(tempfile.gettempdir(), "django_translate_bench_lazy_strings")
+    common.generate_catalogues(path, ["en", "fr"], ["django"], 1000)
+
+    print("{0} strings".format(strings))
+    print("{0:<10}{1:>14}{2:>20}{3:>20}".format("mode", "import [ms]", "first render [ms]", "next render [ms]"))
+    for mode in ["eager", "lazy"]:
+        result = common.run_isolated(__file__, "--child", path, mode, strings)
+        print("{0:<10}{1:>14.1f}{2:>20.1f}{3:>20.1f}".format(
+            mode, result["import"] * 1000, result["first_render"] * 1000, result["next_render"] * 1000))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        child(*sys.argv[2:])
+    else:
+        main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+Runs every hot path of django_translate against synthetic catalogues of given sizes (total
+number of messages, spread over 4 locales and 4 domains) and prints the results. Each
+benchmark runs in a fresh interpreter, nothing but django and python_translate is needed.
+
+    python benchmarks/suite.py [--sizes 1000,100000,1000000] [--only trans,render]
+                               [--save results.json] [--compare baseline.json] [--threshold 1.25]
+
+Results saved with --save (e.g. before upgrading django or python_translate) may be compared
+with a later run with --compare, which exits with status 1 when any of the measured times got
+slower by more than --threshold.
+"""
+
+import os
+import io
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+
+LOCALES = ["en", "fr", "de", "pl"]
+DOMAINS = ["messages", "django", "admin", "forms"]
+APPS = 50
+
+
+def get_paths(size):
+    root = os.path.join(tempfile.gettempdir(), "django_translate_bench_suite_{0}".format(size))
+    return root, os.path.join(root, "tranz"), os.path.join(root, "tree")
+
+
+def generate(size):
+    """
+    Writes catalogues of `size` messages, translation directories of APPS apps and a source tree
+    with templates using messages of the catalogues
+    """
+    root, catalogues, tree = get_paths(size)
+    messages = max(10, size // (len(LOCALES) * len(DOMAINS)))
+    common.generate_catalogues(catalogues, LOCALES, DOMAINS, messages, format="json")
+
+    for i in range(APPS):
+        common.generate_catalogues(os.path.join(root, "apps", "app_{0}".format(i), "tranz"), LOCALES, ["app"], 10)
+
+    templates = os.path.join(tree, "templates")
+    if not os.path.isdir(templates):
+        os.makedirs(templates)
+        for i in range(min(max(size // 100, 50), 5000)):
+            with open(os.path.join(templates, "template_{0}.html".format(i)), "w") as f:
+                f.write("{% load tranz %}\n<h1>{{ title }}</h1>\n")
+                for j in range(10):
+                    id = (i * 10 + j) % messages
+                    if id % 10 == 0:
+                        f.write('<p>{{% tranzchoice "messages.plural_{0}" number count %}}</p>\n'.format(id))
+                    else:
+                        f.write('<p>{{% tranz "messages.message_{0}" name=user.name %}}</p>\n'.format(id))
+                f.write('<p>{% tranz "messages.missing" from "messages" %}</p>\n')
+    return messages
+
+
+def setup(size, **options):
+    root, catalogues, tree = get_paths(size)
+    common.setup_django(TRANZ_LOCALE_PATHS=[catalogues], LANGUAGES=[(l, l) for l in LOCALES], **options)
+
+
+def get_ids(messages, count=100):
+    ids = ["messages.message_{0}".format(i) for i in range(messages) if i % 10][:count]
+    plurals = ["messages.plural_{0}".format(i) for i in range(0, messages, 10)][:count]
+    return ids, plurals
+
+
+def bench_boot(size, messages):
+    import_time, _ = common.timed(setup, size)
+    from django_translate import services
+
+    first_time, _ = common.timed(services.trans, "messages.message_1", {"name": "Adam"}, "messages", "fr")
+    return {"boot [ms]": import_time * 1000, "first trans [ms]": first_time * 1000, "rss [MB]": common.rss() / 1024.0}
+
+
+def bench_trans(size, messages, **options):
+    setup(size, **options)
+    from django_translate import services
+
+    translator = services.translator
+    ids, plurals = get_ids(messages)
+    for locale in LOCALES:
+        translator.get_catalogue(locale)
+    # A newly launched locale without translation files of its own, falling back on fr and en
+    translator.set_fallback_locales(["en"])
+    translator.get_catalogue("fr_CA")
+
+    def trans():
+        for id in ids:
+            translator.trans(id, {"name": "Adam"}, "messages", "fr")
+
+    def trans_fallback():
+        for id in ids:
+            translator.trans(id, {"name": "Adam"}, "messages", "fr_CA")
+
+    def trans_miss():
+        for id in ids:
+            translator.trans("missing." + id, {"name": "Adam"}, "messages", "fr_CA")
+
+    def transchoice():
+        for i, id in enumerate(plurals):
+            translator.transchoice(id, i, {}, "messages", "fr")
+
+    return {
+        "trans [us]": common.best_of(trans, number=100) / len(ids),
+        "trans fallback [us]": common.best_of(trans_fallback, number=100) / len(ids),
+        "trans miss [us]": common.best_of(trans_miss, number=100) / len(ids),
+        "transchoice [us]": common.best_of(transchoice, number=100) / len(plurals),
+    }
+
+
+def bench_memory(size, messages, compact=False):
+    setup(size, TRANZ_COMPACT_CATALOGUES=compact)
+    from django_translate import services
+
+    translator = services.translator
+    ids, plurals = get_ids(messages)
+    before = common.rss()
+    for locale in LOCALES:
+        for domain in DOMAINS:
+            translator.trans(ids[0], {"name": "Adam"}, domain, locale)
+
+    def trans():
+        for id in ids:
+            translator.trans(id, {"name": "Adam"}, "messages", "fr")
+
+    return {
+        "all locales [MB]": (common.rss() - before) / 1024.0,
+        "trans [us]": common.best_of(trans, number=100) / len(ids),
+    }
+
+
+def bench_render(size, messages, **options):
+    setup(size, **options)
+    from django.template import engines, Context
+    from django.utils import translation
+
+    ids, plurals = get_ids(messages)
+    source = "{% load tranz %}" + "".join(
+        '{{% tranz "{0}" name=user.name %}}{{% tranzchoice "{1}" number count %}}'.format(id, plural)
+        for id, plural in zip(ids, plurals))
+    template = engines["django"].engine.from_string(source)
+    context = Context({"user": {"name": "Adam"}, "count": 3})
+    tags = min(len(ids), len(plurals)) * 2
+
+    with translation.override("fr"):
+        template.render(context)
+        return {"tranz tag [us]": common.best_of(lambda: template.render(context), number=100) / tags}
+
+
+def bench_pretranslated(size, messages):
+    root, catalogues, tree = get_paths(size)
+    pages = os.path.join(root, "pages")
+    ids, plurals = get_ids(messages)
+    if not os.path.isdir(pages):
+        os.makedirs(pages)
+    with open(os.path.join(pages, "translated.html"), "w") as f:
+        f.write("{% load tranz %}" + "".join('<li>{{% tranz "{0}" name="Adam" %}}</li>'.format(id) for id in ids))
+    with open(os.path.join(pages, "untranslated.html"), "w") as f:
+        f.write("".join('<li>Hello Adam, this is {0}</li>'.format(id) for id in ids))
+
+    inner = ["django.template.loaders.filesystem.Loader"]
+    setup(size, TEMPLATES=[
+        {"BACKEND": "django.template.backends.django.DjangoTemplates", "NAME": name, "DIRS": [pages],
+         "OPTIONS": {"loaders": [(loader, inner)]}}
+        for name, loader in [("cached", "django.template.loaders.cached.Loader"),
+                             ("pretranslated", "django_translate.template_loaders.Loader")]])
+    from django.template import engines
+    from django.utils import translation
+
+    def render(engine, name):
+        return lambda: engines[engine].get_template(name).render({})
+
+    with translation.override("fr"):
+        return {
+            "{0} [us]".format(engine_name): common.best_of(render(engine, name), number=1000)
+            for engine_name, engine, name in [("cached loader", "cached", "translated.html"),
+                                              ("pretranslating loader", "pretranslated", "translated.html"),
+                                              ("untranslated", "cached", "untranslated.html")]
+        }
+
+
+def bench_gettext(size, messages):
+    setup(size, TRANZ_REPLACE_DJANGO_TRANSLATIONS=True)
+    from django.utils import translation
+
+    ids = ["django.message_{0}".format(i) for i in range(messages) if i % 10][:100]
+    with translation.override("fr"):
+        [translation.ugettext(id) for id in ids]
+        return {
+            "ugettext [us]": common.best_of(lambda: [translation.ugettext(id) for id in ids], number=100) / len(ids),
+            "ugettext miss [us]": common.best_of(lambda: translation.ugettext("not translated"), number=10000),
+        }
+
+
+def bench_discover(size, messages):
+    root, catalogues, tree = get_paths(size)
+    apps = [os.path.join(root, "apps", "app_{0}".format(i), "tranz") for i in range(APPS)]
+    common.setup_django(TRANZ_LOCALE_PATHS=[catalogues] + apps, LANGUAGES=[(l, l) for l in LOCALES])
+    from django_translate import services
+
+    return {"discover_resources [ms]": common.best_of(
+        lambda: services.discover_resources(use_manifest=False), number=10) / 1000}
+
+
+def bench_commands(size, messages):
+    setup(size)
+    from django.core.management import call_command
+
+    root, catalogues, tree = get_paths(size)
+    output_dir = os.path.join(root, "output")
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    shutil.copytree(catalogues, output_dir)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        validate, _ = common.timed(call_command, "tranzvalidate", path=tree, tranz_dir=catalogues, locale="fr")
+        dump, _ = common.timed(call_command, "tranzdump", path=tree, output_dir=output_dir, locales=LOCALES,
+                               format="json", force=True)
+    return {"tranzvalidate [s]": validate, "tranzdump [s]": dump}
+
+
+BENCHMARKS = [
+    ("boot", bench_boot),
+    ("trans", bench_trans),
+    ("memory", bench_memory),
+    ("compact", lambda size, messages: bench_memory(size, messages, compact=True)),
+    ("render", bench_render),
+    ("cached_trans", lambda size, messages: bench_trans(size, messages, TRANZ_RESULT_CACHE_SIZE=10000)),
+    ("cached_render", lambda size, messages: bench_render(size, messages, TRANZ_RESULT_CACHE_SIZE=10000)),
+    ("gettext", bench_gettext),
+    ("pretranslated", bench_pretranslated),
+    ("discover", bench_discover),
+    ("commands", bench_commands),
+]
+
+
+def child(name, size, messages):
+    print(json.dumps(dict(BENCHMARKS)[name](int(size), int(messages))))
+
+
+def compare(results, baseline, threshold):
+    """
+    @rtype: list
+    @return: Descriptions of metrics slower than in baseline by more than threshold
+    """
+    regressions = []
+    for size, benchmarks in sorted(results.items()):
+        for name, metrics in sorted(benchmarks.items()):
+            for metric, value in sorted(metrics.items()):
+                previous = baseline.get(size, {}).get(name, {}).get(metric)
+                if previous and value > previous * threshold:
+                    regressions.append("{0} messages, {1}: {2:.2f} -> {3:.2f}".format(size, metric, previous, value))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of django_translate")
+    parser.add_argument("--sizes", default="1000,100000", help="Comma separated catalogue sizes, e.g. 1000,100000,1000000")
+    parser.add_argument("--only", default=None, help="Comma separated benchmarks to run: " +
+                                                      ", ".join(name for name, _ in BENCHMARKS))
+    parser.add_argument("--save", default=None, help="Save results into a json file")
+    parser.add_argument("--compare", default=None, help="Compare results with a file saved by --save")
+    parser.add_argument("--threshold", default=1.25, type=float, help="Slowdown reported as a regression")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else [name for name, _ in BENCHMARKS]
+    results = {}
+    for size in [int(s) for s in args.sizes.split(",")]:
+        messages = generate(size)
+        print("{0} messages ({1} locales x {2} domains x {3})".format(size, len(LOCALES), len(DOMAINS), messages))
+        results[str(size)] = {}
+        for name in names:
+            metrics = common.run_isolated(__file__, "--child", name, size, messages)
+            results[str(size)][name] = metrics
+            for metric, value in sorted(metrics.items()):
+                print("  {0:<14}{1:<28}{2:>12.2f}".format(name, metric, value))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print("Regression: " + regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        child(*sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Measures extraction of {% tranz %} tags by DjangoTemplateExtractor from a synthetic corpus
+of templates, most of which - like in a real project - do not use the tags at all.
+"lexer" is how templates used to be processed: every file tokenized by django's Lexer,
+five regexes run over each tranz tag.
+
+    python benchmarks/template_extraction.py [templates]
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+
+PLAIN = """{% extends "base.html" %}
+{% block content %}
+<h1>{{ page.title }}</h1>
+{% for item in items %}<div class="item {{ item.css }}">{{ item.name }} {% if item.new %}*{% endif %}</div>
+{% endfor %}
+{# rendered {{ count }} times #}
+{% endblock %}
+"""
+
+TRANSLATED = """{% extends "base.html" %}
+{% load tranz %}
+{% block content %}
+<h1>{% tranz "page.title___I__" %}</h1>
+{% for item in items %}<div>{% tranz "item.label" name=item.name from "items" %}</div>
+<span>{% tranzchoice "item.count" number item.count into "fr" %}</span>{% endfor %}
+<p>{% tranz message___I__ user=user.name count=5 %}</p>
+{% endblock %}
+"""
+
+
+def generate_templates(path, templates):
+    """
+    Writes `templates` files, every fifth of them with tranz tags
+    """
+    if os.path.isdir(path) and len(os.listdir(path)) == templates:
+        return
+    if not os.path.isdir(path):
+        os.makedirs(path)
+
+    for i in range(templates):
+        with open(os.path.join(path, "template_{0}.html".format(i)), "w") as f:
+            f.write((TRANSLATED.replace("__I__", str(i)) if i % 5 == 0 else PLAIN) * 3)
+
+
+def main(templates=50000):
+    path = os.path.join(tempfile.gettempdir(), "django_translate_bench_templates_{0}".format(templates))
+    generate_templates(path, templates)
+    common.setup_django()
+
+    from django.template.base import Lexer, TOKEN_BLOCK
+    from python_translate.extractors.base import Translation, TransVar
+    from django_translate.extractors import django_template
+    from django_translate import extraction
+
+    class LexerExtractor(django_template.DjangoTemplateExtractor):
+
+        def extract_translations(self, string):
+            trans = []
+            for t in Lexer(string).tokenize():
+                if t.token_type == TOKEN_BLOCK and t.contents.startswith((self.tranz_tag, self.tranzchoice_tag)):
+                    trans.append(Translation(
+                        id=self._match_to_transvar(django_template.id_re, t.contents),
+                        number=self._match_to_transvar(django_template.number_re, t.contents),
+                        domain=self._match_to_transvar(django_template.domain_re, t.contents),
+                        locale=self._match_to_transvar(django_template.locale_re, t.contents),
+                        is_transchoice=t.contents.startswith(self.tranzchoice_tag + " "),
+                        parameters=TransVar(
+                            [x.split("=")[0].strip() for x in django_template.properties_re.findall(t.contents) if x],
+                            TransVar.LITERAL
+                        ),
+                        lineno=t.lineno,
+                    ))
+            return trans
+
+    paths = sorted(os.path.join(path, name) for name in os.listdir(path))
+
+    def extract(extractor):
+        return [extraction.extract_file(extractor, p) for p in paths]
+
+    def dump(results):
+        return [[(t.id.value, t.number.value, t.domain.value, t.locale.value, t.parameters.value, t.lineno)
+                 for t in translations] for translations in results]
+
+    print("{0} templates".format(templates))
+    print("{0:<10}{1:>12}{2:>18}".format("mode", "time [s]", "templates / s"))
+    results = {}
+    for mode, extractor in [("lexer", LexerExtractor()), ("scanner", django_template.DjangoTemplateExtractor())]:
+        extract(extractor)
+        elapsed, results[mode] = common.timed(extract, extractor)
+        print("{0:<10}{1:>12.2f}{2:>18.0f}".format(mode, elapsed, templates / elapsed))
+
+    if dump(results["lexer"]) != dump(results["scanner"]):
+        print("Results differ!")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the cost of rendering a single {% tranz %}/{% tranzchoice %} tag
+
+    python benchmarks/tranz_tag.py
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+
+TAGS = [
+    ('literal', '{% tranz "messages.message_2" %}'),
+    ('literal + into', '{% tranz "messages.message_2" from "messages" into "fr" %}'),
+    ('parameters', '{% tranz "messages.message_1" name="Adam" %}'),
+    ('variables', '{% tranz message_id name=user.name from domain %}'),
+    ('tranzchoice', '{% tranzchoice "messages.plural_0" number 5 %}'),
+    ('tranzchoice + variable', '{% tranzchoice "messages.plural_0" number count %}'),
+]
+
+REPEAT = 100
+
+
+def main():
+    path = os.path.join(tempfile.gettempdir(), "django_translate_bench_tag")
+    common.generate_catalogues(path, ["en", "fr"], ["messages"], 100)
+    common.setup_django(TRANZ_LOCALE_PATHS=[path])
+
+    from django.template import engines, Context
+    engine = engines["django"].engine
+    context = Context({"message_id": "messages.message_1", "user": {"name": "Adam"}, "domain": "messages", "count": 3})
+
+    print("{0:<26}{1:>16}".format("tag", "render [us]"))
+    for name, tag in TAGS:
+        template = engine.from_string("{% load tranz %}" + tag * REPEAT)
+        template.render(context)
+        print("{0:<26}{1:>16.2f}".format(name, common.best_of(lambda: template.render(context), number=100) / REPEAT))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""
+Compact catalogues, see settings.TRANZ_COMPACT_CATALOGUES
+
+For every message of every locale, a CaseInsensitiveDict keeps a lowercased id, the id itself,
+a tuple and a dict entry - well over a hundred bytes before the message text - and catalogues
+of all locales repeat the same ids. Here ids of a domain are stored once, in an IdTable shared
+by catalogues of all locales, which maps every lowercased id to a slot. The catalogue of a locale
+only keeps a list of its messages indexed by these slots: 8 bytes per id of the domain.
+"""
+
+import sys
+import threading
+from collections.abc import Mapping
+
+from django_translate.translations import TranslatorMixin, LazyMessageCatalogue, FallbackIndex, \
+    get_domain_messages
+from django_translate.freezing import FrozenMessages
+
+
+class IdTable(object):
+    """
+    Ids of a domain and their slots, shared by catalogues of all locales. Ids are only ever added.
+
+    slots: {lowercased id: slot}
+    ids: id of every slot, spelled as in the first catalogue it was added from
+    """
+
+    __slots__ = ('slots', 'ids', '_lock')
+
+    def __init__(self):
+        self.slots = {}
+        self.ids = []
+        self._lock = threading.Lock()
+
+    def add(self, store):
+        """
+        @type store: dict
+        @param store: {lowercased id: (id, message)}, e.g. CaseInsensitiveDict._store
+
+        @rtype: list
+        @return: Slot of every id of store, in its order
+        """
+        slots = self.slots
+        ids = self.ids
+        result = []
+        with self._lock:
+            for lower, (id, _) in list(store.items()):
+                slot = slots.get(lower)
+                if slot is None:
+                    # The slot is published last, readers never see a slot without its id
+                    slot = len(ids)
+                    ids.append(lower if id == lower else id)
+                    slots[lower] = slot
+                result.append(slot)
+        return result
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class CompactMessages(Mapping):
+    """
+    Read-only, case insensitive mapping of message ids to messages,
+    a drop-in replacement of python_translate.utils.CaseInsensitiveDict
+    """
+
+    __slots__ = ('table', 'messages', 'spellings', '_count')
+
+    def __init__(self, table, messages, spellings=None):
+        """
+        @type table: IdTable
+
+        @type messages: list
+        @param messages: Message of every slot of table, None for ids missing in this catalogue
+
+        @type spellings: dict
+        @param spellings: {slot: id} of ids spelled differently than in table
+        """
+        self.table = table
+        self.messages = messages
+        self.spellings = spellings or None
+        self._count = len(messages) - messages.count(None)
+
+    @classmethod
+    def from_store(cls, table, store):
+        """
+        @type table: IdTable
+        @type store: dict
+        @param store: {lowercased id: (id, message)}, e.g. CaseInsensitiveDict._store
+
+        @rtype: CompactMessages
+        """
+        slots = table.add(store)
+        messages = [None] * (max(slots) + 1 if slots else 0)
+        spellings = {}
+        ids = table.ids
+        for slot, (id, message) in zip(slots, list(store.values())):
+            messages[slot] = message
+            if ids[slot] != id:
+                spellings[slot] = id
+        return cls(table, messages, spellings)
+
+    def get(self, id, default=None):
+        slot = self.table.slots.get(id.lower()) if isinstance(id, str) else None
+        if slot is None or slot >= len(self.messages):
+            return default
+        message = self.messages[slot]
+        return default if message is None else message
+
+    def __getitem__(self, id):
+        message = self.get(id)
+        if message is None:
+            raise KeyError(id)
+        return message
+
+    def __contains__(self, id):
+        return self.get(id) is not None
+
+    def __iter__(self):
+        ids = self.table.ids
+        spellings = self.spellings or {}
+        for slot, message in enumerate(self.messages):
+            if message is not None:
+                yield spellings.get(slot) or ids[slot]
+
+    def __len__(self):
+        return self._count
+
+    def __repr__(self):
+        return "<CompactMessages of {0} messages>".format(self._count)
+
+
+class CompactLocales(object):
+    """
+    Locale every message of a compact fallback index comes from, see FallbackIndex.locales
+    """
+
+    __slots__ = ('table', 'locales')
+
+    def __init__(self, table, locales):
+        self.table = table
+        self.locales = locales
+
+    def get(self, lower, default=None):
+        slot = self.table.slots.get(lower)
+        if slot is None or slot >= len(self.locales):
+            return default
+        return self.locales[slot] or default
+
+
+class CompactCatalogueMixin(TranslatorMixin):
+    """
+    Stores messages of every loaded catalogue as CompactMessages, see settings.TRANZ_COMPACT_CATALOGUES
+
+    Fallback indexes of compact catalogues are compact as well: a list of messages and a list
+    of locales they come from, both indexed by slots of the domain.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.id_tables = {}
+        self._id_tables_lock = threading.Lock()
+        super(CompactCatalogueMixin, self).__init__(*args, **kwargs)
+
+    def get_id_table(self, domain):
+        """
+        @type domain: str
+        @rtype: IdTable
+        """
+        table = self.id_tables.get(domain)
+        if table is None:
+            with self._id_tables_lock:
+                table = self.id_tables.setdefault(domain, IdTable())
+        return table
+
+    def reset_after_fork(self):
+        self._id_tables_lock = threading.Lock()
+        for table in list(self.id_tables.values()):
+            table._lock = threading.Lock()
+        super(CompactCatalogueMixin, self).reset_after_fork()
+
+    def compact_messages(self, domain, messages):
+        """
+        @type domain: str
+        @type messages: collections.abc.Mapping
+        @rtype: collections.abc.Mapping
+        @return: CompactMessages, or messages as they are when they hold anything else than strings
+        """
+        if isinstance(messages, (CompactMessages, FrozenMessages)):
+            return messages
+
+        store = getattr(messages, "_store", None)
+        if store is None:
+            store = {id.lower(): (id, message) for id, message in list(messages.items())}
+        if not all(isinstance(id, str) and isinstance(message, str) for id, message in list(store.values())):
+            return messages
+        return CompactMessages.from_store(self.get_id_table(domain), store)
+
+    def _create_catalogue(self, locale):
+        catalogue = super(CompactCatalogueMixin, self)._create_catalogue(locale)
+        if isinstance(catalogue, LazyMessageCatalogue):
+            catalogue.prepare_messages = self.compact_messages
+        else:
+            for domain, messages in list(catalogue.messages.items()):
+                catalogue.messages[domain] = self.compact_messages(domain, messages)
+        return catalogue
+
+    def _build_fallback_index(self, domain, locale):
+        catalogues = self._get_catalogue_chain(locale)
+        chain = [(catalogue.locale, get_domain_messages(catalogue, domain)) for catalogue in catalogues]
+        chain = [(catalogue_locale, messages) for catalogue_locale, messages in chain if len(messages)]
+        table = self.id_tables.get(domain)
+        if not chain or not all(isinstance(messages, CompactMessages) and messages.table is table
+                                for _, messages in chain):
+            return super(CompactCatalogueMixin, self)._build_fallback_index(domain, locale)
+
+        size = max(len(messages.messages) for _, messages in chain)
+        resolved = [None] * size
+        locales = [None] * size
+        for catalogue_locale, messages in reversed(chain):
+            for slot, message in enumerate(messages.messages):
+                if message is not None:
+                    resolved[slot] = message
+                    locales[slot] = catalogue_locale
+
+        index = FallbackIndex(catalogues[-1].locale)
+        index.messages = CompactMessages(table, resolved)
+        index.locales = CompactLocales(table, locales)
+        return index
+
+
+def _sizeof(obj, seen):
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    return sys.getsizeof(obj)
+
+
+def measure_messages(messages, seen):
+    """
+    Estimates memory used by messages of a domain
+
+    @type messages: collections.abc.Mapping
+    @type seen: set
+    @param seen: Ids of objects already measured, they are not counted again
+
+    @rtype: int
+    @return: Bytes
+    """
+    size = _sizeof(messages, seen)
+    if isinstance(messages, CompactMessages):
+        size += _sizeof(messages.messages, seen)
+        size += sum(_sizeof(message, seen) for message in messages.messages if message is not None)
+        if messages.spellings:
+            size += _sizeof(messages.spellings, seen)
+            size += sum(_sizeof(id, seen) for id in list(messages.spellings.values()))
+    elif isinstance(messages, FrozenMessages):
+        size += len(messages._buffer)
+    elif hasattr(messages, "_store"):
+        size += _sizeof(messages._store, seen)
+        for lower, entry in list(messages._store.items()):
+            size += _sizeof(lower, seen) + _sizeof(entry, seen) + _sizeof(entry[0], seen) + _sizeof(entry[1], seen)
+    else:
+        size += sum(_sizeof(id, seen) + _sizeof(message, seen) for id, message in list(messages.items()))
+    return size
+
+
+def measure_id_table(table, seen):
+    """
+    @type table: IdTable
+    @type seen: set
+    @rtype: int
+    @return: Bytes used by ids of a domain shared by all locales
+    """
+    size = _sizeof(table, seen) + _sizeof(table.slots, seen) + _sizeof(table.ids, seen)
+    for lower, slot in list(table.slots.items()):
+        size += _sizeof(lower, seen) + _sizeof(table.ids[slot], seen)
+    return size
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Filesystem part of django_translate.services.discover_resources()
+
+Every discovery path is listed with a single os.scandir() call. The result may be stored
+in a manifest file (settings.TRANZ_DISCOVERY_MANIFEST) together with modification times
+of all scanned directories - adding, removing or renaming a file changes the modification
+time of its directory, so as long as none of them has changed the manifest is up to date
+and the next boot doesn't have to list any directory at all.
+"""
+
+import os
+import json
+import time
+
+MANIFEST_VERSION = 1
+
+# Directories modified this recently may still change within the same mtime tick,
+# a manifest is not written until they settle down
+MTIME_SAFETY_MARGIN = 2
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _scandir(path):
+    try:
+        return list(os.scandir(path))
+    except OSError:
+        return None
+
+
+def scan(paths, languages, lc_messages=False):
+    """
+    Searches given paths for translation files matching [domain].[lang].[format],
+    and [lang]/LC_MESSAGES/[domain].[format] if lc_messages is True
+
+    @type paths: list
+    @type languages: list
+    @param languages: Languages to look for in LC_MESSAGES directories
+
+    @rtype: tuple
+    @return: A list of (format, path, lang, domain) and a dict of {scanned directory: mtime}
+    """
+    resources = []
+    directories = {}
+    for path in paths:
+        # mtime is taken before listing, so a change made during the scan makes the manifest stale
+        directories[path] = _mtime(path)
+        entries = _scandir(path) if directories[path] is not None else None
+        if entries is None:
+            directories[path] = None
+            continue
+
+        subdirectories = set()
+        for entry in entries:
+            if entry.is_file():
+                try:
+                    domain, lang, format = entry.name.split('.')
+                except ValueError as e:
+                    continue
+                resources.append((format, entry.path, lang, domain))
+            elif lc_messages and entry.is_dir():
+                subdirectories.add(entry.name)
+
+        # Try to match django's LC_MESSAGES directories
+        if lc_messages:
+            for lang in languages:
+                if lang not in subdirectories:
+                    continue
+                lang_path = os.path.join(path, lang)
+                LC_MESSAGES_PATH = os.path.join(lang_path, 'LC_MESSAGES')
+                directories[lang_path] = _mtime(lang_path)
+                directories[LC_MESSAGES_PATH] = _mtime(LC_MESSAGES_PATH)
+                for entry in _scandir(LC_MESSAGES_PATH) or []:
+                    try:
+                        domain, format = entry.name.split('.')
+                    except ValueError as e:
+                        continue
+                    resources.append((format, entry.path, lang, domain))
+
+    return resources, directories
+
+
+def read_manifest(path, key):
+    """
+    @type key: object
+    @param key: Anything json-serializable describing discovery settings
+
+    @rtype: list
+    @return: Resources stored in the manifest or None if it's missing or out of date
+    """
+    try:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("key") != json.loads(json.dumps(key)):
+        return None
+
+    for directory, mtime in list(manifest["directories"].items()):
+        if _mtime(directory) != mtime:
+            return None
+
+    return [tuple(resource) for resource in manifest["resources"]]
+
+
+def write_manifest(path, key, resources, directories):
+    """
+    Stores discovered resources in a manifest, unless some of the directories were modified just now
+
+    @rtype: bool
+    @return: True if the manifest was written
+    """
+    threshold = (time.time() - MTIME_SAFETY_MARGIN) * 1e9
+    if any(mtime is not None and mtime > threshold for mtime in list(directories.values())):
+        return False
+
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    tmp_path = "{0}.{1}.tmp".format(path, os.getpid())
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            "version": MANIFEST_VERSION,
+            "key": key,
+            "directories": directories,
+            "resources": resources,
+        }, f)
+    os.replace(tmp_path, path)
+    return True
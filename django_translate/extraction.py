@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""
+Extraction of translations from source files, shared by tranzdump and tranzvalidate commands
+"""
+
+import os
+import sys
+import time
+import pickle
+import sqlite3
+import fnmatch
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+from python_translate.extractors import base as extractors
+
+# Files sent to a worker process at once, at most
+MAX_CHUNK_SIZE = 64
+
+# Bump whenever results of extraction change for the same file and extractor settings
+CACHE_VERSION = 1
+
+# Files modified this recently may change again within the same mtime tick,
+# they are taken from cache only if their content hash matches
+MTIME_SAFETY_MARGIN = 2
+
+
+def get_subextractors(extractor):
+    """
+    @type extractor: AbstractExtractor
+    @rtype: list
+    """
+    if isinstance(extractor, extractors.ChainExtractor):
+        return list(extractor._extractors.values())
+    return [extractor]
+
+
+def uses_default_extract(subextractor):
+    """
+    Tells whether subextractor adds messages to catalogues the way BaseExtractor.extract() does,
+    which means extracted translations may be turned into messages by add_to_catalogue()
+
+    @rtype: bool
+    """
+    return isinstance(subextractor, extractors.BaseExtractor) and \
+        type(subextractor).extract is extractors.BaseExtractor.extract
+
+
+def compile_excluded_paths(paths):
+    """
+    @type paths: list
+    @param paths: Excluded directories (or files), e.g. --exclude-dir options and settings.TRANZ_EXCLUDED_DIRS
+
+    @rtype: frozenset
+    @return: Normalized absolute paths, for is_excluded() and find_files()
+    """
+    return frozenset(os.path.normpath(os.path.abspath(path)) for path in paths)
+
+
+def is_excluded(path, excluded):
+    """
+    Tells whether path or any of its parent directories is excluded
+
+    @type excluded: frozenset
+    @rtype: bool
+    """
+    path = os.path.normpath(os.path.abspath(path))
+    while path not in excluded:
+        parent = os.path.dirname(path)
+        if parent == path:
+            return False
+        path = parent
+    return True
+
+
+def find_files(root_path, patterns, excluded=frozenset()):
+    """
+    Same as python_translate.utils.find_files(), but excluded directories are not entered at all
+
+    @type root_path: str
+    @type patterns: list
+    @type excluded: frozenset
+
+    @rtype: list
+    """
+    if is_excluded(root_path, excluded):
+        return []
+
+    matches = []
+    for root, dirnames, filenames in os.walk(root_path):
+        if excluded:
+            base = os.path.normpath(os.path.abspath(root))
+            dirnames[:] = [d for d in dirnames if os.path.join(base, d) not in excluded]
+            filenames = [f for f in filenames if os.path.join(base, f) not in excluded]
+        for pattern in patterns:
+            for filename in fnmatch.filter(filenames, pattern):
+                matches.append(os.path.join(root, filename))
+    return matches
+
+
+def list_files(subextractor, root_path, excluded=frozenset()):
+    """
+    @type subextractor: BaseExtractor
+    @type root_path: str
+
+    @type excluded: frozenset
+    @param excluded: Paths returned by compile_excluded_paths()
+
+    @rtype: list
+    @return: Paths of files under root_path subextractor can process
+    """
+    # BaseExtractor.extract_files() takes any string for an iterable of paths on python 3
+    if isinstance(root_path, str) and os.path.isdir(root_path):
+        if isinstance(subextractor, extractors.ExtensionBasedExtractor) and \
+                type(subextractor)._extract_from_directory is extractors.ExtensionBasedExtractor._extract_from_directory:
+            patterns = subextractor.file_extensions
+            if not isinstance(patterns, (list, tuple)):
+                patterns = [patterns]
+            return find_files(root_path, patterns, excluded)
+        paths = subextractor._extract_from_directory(root_path)
+    else:
+        paths = subextractor.extract_files(root_path)
+    return [path for path in paths if not is_excluded(path, excluded)] if excluded else paths
+
+
+def raise_extraction_error(subextractor, path):
+    """
+    Re-raises exception being handled as a ValueError naming the extractor and the file
+    """
+    exc_type, exc_value, exc_traceback = sys.exc_info()
+    msg = 'There was an exception in extractor {0} when processing ' \
+          'resource "{1}"'.format(type(subextractor).__name__, path)
+    msg = msg + "\nOriginal message: {0} {1}".format(exc_type.__name__, exc_value)
+    raise ValueError(msg).with_traceback(exc_traceback)
+
+
+def extract_file(subextractor, path):
+    """
+    @type subextractor: BaseExtractor
+    @type path: str
+
+    @rtype: list
+    @return: A list of Translation objects
+    """
+    try:
+        # Extractors accepting bytes skip files without anything to extract before decoding them
+        with open(path, 'rb' if getattr(subextractor, 'accepts_bytes', False) else 'r') as f:
+            translations = subextractor.extract_translations(f.read())
+        for t in translations:
+            t.file = path
+        return translations
+    except Exception as e:
+        raise_extraction_error(subextractor, path)
+
+
+def _extract_chunk(subextractor, paths):
+    return [extract_file(subextractor, path) for path in paths]
+
+
+def _extract_files(subextractor, paths, jobs):
+    if jobs <= 1 or len(paths) < 2:
+        return [extract_file(subextractor, path) for path in paths]
+
+    chunk_size = max(1, min(MAX_CHUNK_SIZE, len(paths) // (jobs * 4)))
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        results = pool.map(_extract_chunk, [subextractor] * len(chunks), chunks)
+        return [translations for chunk in results for translations in chunk]
+
+
+def extract_files(subextractor, paths, jobs=1, cache=None):
+    """
+    Extracts translations from given files, using a pool of `jobs` processes if jobs > 1.
+    Results do not depend on the number of processes.
+
+    @type subextractor: BaseExtractor
+    @type paths: list
+    @type jobs: int
+
+    @type cache: ExtractionCache
+    @param cache: Files found in this cache are not processed again
+
+    @rtype: list
+    @return: A list of (path, translations) in the same order as paths
+    """
+    paths = list(paths)
+    results = [cache.get(subextractor, path) if cache is not None else None for path in paths]
+
+    missing = [i for i, translations in enumerate(results) if translations is None]
+    extracted = _extract_files(subextractor, [paths[i] for i in missing], jobs)
+    for i, translations in zip(missing, extracted):
+        results[i] = translations
+        if cache is not None:
+            cache.set(subextractor, paths[i], translations)
+
+    return list(zip(paths, results))
+
+
+def get_extractor_config(subextractor):
+    """
+    @rtype: str
+    @return: Description of an extractor and all its settings which may affect extracted translations
+    """
+    settings = sorted((k, repr(v)) for k, v in list(vars(subextractor).items()) if k != 'prefix')
+    return "{0}:{1}.{2}:{3!r}".format(CACHE_VERSION, type(subextractor).__module__,
+                                      type(subextractor).__name__, settings)
+
+
+class ExtractionCache(object):
+    """
+    Translations extracted from files, stored in a sqlite database in given directory.
+    An entry is used as long as the file has the same size and modification time,
+    or the same content hash, and the extractor has the same settings.
+    """
+
+    def __init__(self, directory):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self.hits = 0
+        self.misses = 0
+        self._pending = {}
+        self._connection = sqlite3.connect(os.path.join(directory, "extraction.sqlite3"))
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT, config TEXT, size INTEGER, mtime INTEGER, hash TEXT, translations BLOB, "
+            "PRIMARY KEY (path, config))"
+        )
+
+    def get(self, subextractor, path):
+        """
+        @rtype: list
+        @return: Cached translations of the file, None if it has to be extracted again
+        """
+        config = get_extractor_config(subextractor)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.misses += 1
+            return None
+
+        row = self._connection.execute(
+            "SELECT size, mtime, hash, translations FROM files WHERE path = ? AND config = ?", (path, config)
+        ).fetchone()
+
+        settled = stat.st_mtime < time.time() - MTIME_SAFETY_MARGIN
+        if row is not None and settled and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            self.hits += 1
+            return pickle.loads(row[3])
+
+        # Touched, checked out again, or modified just now - compare contents
+        with open(path, 'rb') as f:
+            hash = hashlib.sha1(f.read()).hexdigest()
+        if row is not None and row[2] == hash:
+            self._connection.execute(
+                "UPDATE files SET size = ?, mtime = ? WHERE path = ? AND config = ?",
+                (stat.st_size, stat.st_mtime_ns, path, config)
+            )
+            self.hits += 1
+            return pickle.loads(row[3])
+
+        # Remember the state of the file before it's extracted - if it changes in the meantime,
+        # the entry will be stale and the file will be extracted again next time
+        self._pending[(path, config)] = (stat.st_size, stat.st_mtime_ns, hash)
+        self.misses += 1
+        return None
+
+    def set(self, subextractor, path, translations):
+        config = get_extractor_config(subextractor)
+        state = self._pending.pop((path, config), None)
+        if state is None:
+            return
+
+        size, mtime, hash = state
+        self._connection.execute(
+            "INSERT OR REPLACE INTO files (path, config, size, mtime, hash, translations) VALUES (?, ?, ?, ?, ?, ?)",
+            (path, config, size, mtime, hash, pickle.dumps(translations, pickle.HIGHEST_PROTOCOL))
+        )
+
+    def close(self):
+        self._connection.commit()
+        self._connection.close()
+
+
+def add_to_catalogue(subextractor, translations, catalogue):
+    """
+    Adds extracted translations to the catalogue the same way BaseExtractor.extract() does
+
+    @type translations: list
+    @type catalogue: MessageCatalogue
+    """
+    for t in translations:
+        if not t.id or not t.id.is_literal:
+            continue
+        domain = "messages" if not t.domain or not t.domain.is_literal else t.domain.value
+        catalogue.add(
+            {t.id.value: "{0}{1}".format(subextractor.prefix, t.id.value)}, domain)
+
+
+def get_jobs(jobs):
+    """
+    @type jobs: int
+    @param jobs: Value of --jobs option, 0 means one process per CPU
+
+    @rtype: int
+    """
+    if not jobs:
+        return os.cpu_count() or 1
+    return max(1, jobs)
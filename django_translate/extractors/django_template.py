@@ -2,7 +2,7 @@
 
 import re
 import os
-from django.template.base import Lexer, TOKEN_TEXT, TOKEN_VAR, TOKEN_BLOCK
+from django.template.base import tag_re, BLOCK_TAG_START
 from python_translate.extractors.base import Translation, TransVar, ExtensionBasedExtractor
 
 val = '''(?:[^"' ]+)|(?:"[^"]*?")|(?:'[^']*?')'''
@@ -13,9 +13,23 @@ domain_re = re.compile(r"from\s*({0})".format(val))
 locale_re = re.compile(r"into\s*({0})".format(val))
 properties_re = re.compile(r"(?:\s+\w+=(?:{0}))".format(val))
 
+# id_re, number_re, domain_re and locale_re in a single pattern: each of them is a lookahead
+# matched from the start of tag contents, which captures the same value as the first match
+# found by the standalone regex
+contents_re = re.compile(
+    r"(?:(?=tranz(?:choice)?\s*({0})))?"
+    r"(?:(?=.*?number\s*({0})))?"
+    r"(?:(?=.*?from\s*({0})))?"
+    r"(?:(?=.*?into\s*({0})))?".format(val),
+    re.DOTALL
+)
+
 
 class DjangoTemplateExtractor(ExtensionBasedExtractor):
 
+    # extraction.extract_file() passes contents of files undecoded
+    accepts_bytes = True
+
     def __init__(
             self,
             file_extensions=None,
@@ -30,33 +44,70 @@ class DjangoTemplateExtractor(ExtensionBasedExtractor):
         super(DjangoTemplateExtractor, self).__init__(file_extensions=file_extensions)
 
     def extract_translations(self, string):
-        """Extract messages from Django template string."""
+        """
+        Extract messages from Django template string (str, or utf-8 encoded bytes).
+
+        Tags are found the same way django.template.base.Lexer finds them, but only
+        {% tranz %} and {% tranzchoice %} tags become Translations. Templates which don't
+        contain any of the tag names are skipped without being tokenized at all.
+        """
+        if isinstance(string, bytes):
+            if self.tranz_tag.encode("utf-8") not in string and self.tranzchoice_tag.encode("utf-8") not in string:
+                return []
+            string = string.decode("utf-8")
+        elif self.tranz_tag not in string and self.tranzchoice_tag not in string:
+            return []
 
         trans = []
-        for t in Lexer(string.decode("utf-8"), None).tokenize():
-            if t.token_type == TOKEN_BLOCK:
-                if not t.contents.startswith(
-                        (self.tranz_tag, self.tranzchoice_tag)):
-                    continue
-
-                is_tranzchoice = t.contents.startswith(
-                    self.tranzchoice_tag +
-                    " ")
-                kwargs = {
-                    "id": self._match_to_transvar(id_re, t.contents),
-                    "number": self._match_to_transvar(number_re, t.contents),
-                    "domain": self._match_to_transvar(domain_re, t.contents),
-                    "locale": self._match_to_transvar(locale_re, t.contents),
-                    "is_transchoice": is_tranzchoice, "parameters": TransVar(
-                        [x.split("=")[0].strip() for x in properties_re.findall(t.contents) if x],
-                        TransVar.LITERAL
-                    ),
-                    "lineno": t.lineno,
-                }
-
-                trans.append(Translation(**kwargs))
+        tags = (self.tranz_tag, self.tranzchoice_tag)
+        verbatim = False
+        lineno = 1
+        position = 0
+        for match in tag_re.finditer(string):
+            token_string = match.group(0)
+            if not token_string.startswith(BLOCK_TAG_START):
+                continue
+
+            start = match.start()
+            lineno += string.count("\n", position, start)
+            position = start
+
+            contents = token_string[2:-2].strip()
+            if verbatim:
+                if contents == verbatim:
+                    verbatim = False
+                continue
+            if contents[:9] in ('verbatim', 'verbatim '):
+                verbatim = 'end%s' % contents
+
+            # {% tranz_context %}, {% tranz_cache %}... start with the same letters
+            if contents.startswith(tags) and contents.split(None, 1)[0] in tags:
+                trans.append(self._parse_tag(contents, lineno))
         return trans
 
+    def _parse_tag(self, contents, lineno):
+        """
+        @type contents: str
+        @param contents: Contents of a {% tranz %} or {% tranzchoice %} tag, without the braces
+
+        @rtype: Translation
+        """
+        id, number, domain, locale = contents_re.match(contents).groups()
+        if "=" in contents:
+            parameters = [x.split("=")[0].strip() for x in properties_re.findall(contents) if x]
+        else:
+            parameters = []
+
+        return Translation(
+            id=self._to_transvar(id or ""),
+            number=self._to_transvar(number or ""),
+            domain=self._to_transvar(domain or ""),
+            locale=self._to_transvar(locale or ""),
+            is_transchoice=contents.startswith(self.tranzchoice_tag + " "),
+            parameters=TransVar(parameters, TransVar.LITERAL),
+            lineno=lineno,
+        )
+
     def _match_to_transvar(self, reg, string, default=""):
         match = reg.findall(string)
         return self._to_transvar(match[0] if match else default)
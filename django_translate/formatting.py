@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Precompiled message formatting
+
+Translator.format() runs string.Formatter().vformat() on every call, which parses
+the message again each time. Interpolator parses a message once and keeps it as
+a list of literal text and placeholders.
+
+Similarly, Translator.transchoice() parses plural forms and intervals of a message
+on every call, while PluralSelector does it once per message and locale.
+"""
+
+import string
+from decimal import Decimal
+from collections import defaultdict, OrderedDict
+
+import python_translate.selector as selector
+from python_translate.selector import PluralizationRules
+
+try:
+    from _string import formatter_field_name_split
+except ImportError:
+    formatter_field_name_split = None
+
+_formatter = string.Formatter()
+
+
+class Interpolator(object):
+    """
+    A message split into literal text and placeholders. format() gives exactly the same
+    result as python_translate's Translator.format() (missing parameters are replaced
+    with empty strings).
+    """
+
+    __slots__ = ('message', 'constant', 'segments')
+
+    def __init__(self, message):
+        self.message = message
+        self.constant = None
+        self.segments = None
+
+        try:
+            parsed = list(_formatter.parse(message))
+        except ValueError:
+            # Malformed message - let format() raise the same error as string.Formatter does
+            return
+
+        segments = []
+        for literal_text, field_name, format_spec, conversion in parsed:
+            if literal_text:
+                segments.append(literal_text)
+
+            if field_name is None:
+                continue
+
+            if formatter_field_name_split is None or not field_name or (format_spec and '{' in format_spec):
+                # Positional or nested fields are rare, leave them to string.Formatter
+                return
+
+            first, rest = formatter_field_name_split(field_name)
+            if not isinstance(first, str):
+                return
+            segments.append((first, tuple(rest), conversion, format_spec or ''))
+
+        if all(isinstance(segment, str) for segment in segments):
+            self.constant = "".join(segments)
+        self.segments = segments
+
+    def format(self, parameters):
+        """
+        @type parameters: dict
+        @rtype: str
+        """
+        if self.constant is not None:
+            return self.constant
+
+        if self.segments is None:
+            return _formatter.vformat(self.message, (), defaultdict(str, **parameters))
+
+        parts = []
+        for segment in self.segments:
+            if segment.__class__ is str:
+                parts.append(segment)
+                continue
+
+            name, rest, conversion, format_spec = segment
+            value = parameters.get(name, '')
+            for is_attr, key in rest:
+                value = getattr(value, key) if is_attr else value[key]
+            if conversion is not None:
+                value = _formatter.convert_field(value, conversion)
+            parts.append(format(value, format_spec))
+        return "".join(parts)
+
+
+def get_rule_locale(locale):
+    """
+    Returns the locale whose plural rule applies to given locale,
+    the same way PluralizationRules.get() resolves it
+
+    @type locale: str
+    @rtype: str
+    """
+    if locale == 'pt_BR':
+        # temporary set a locale for brazilian
+        locale = 'xbr'
+
+    if len(locale) > 3:
+        locale = locale.split("_")[0]
+
+    return locale
+
+
+def _zero(number):
+    return 0
+
+
+def _compile_interval(interval):
+    """
+    Turns an interval such as "{0,1}" or "]1,Inf]" into a test function,
+    see python_translate.selector.test_interval()
+
+    @type interval: str
+    @rtype: callable
+    """
+    match = selector.INTERVAL_REGEX.match(interval.strip())
+    if not match:
+        raise ValueError('%s is not a valid interval', interval)
+
+    if match.groups()[0]:
+        try:
+            values = [Decimal(nb.strip()) for nb in match.groups()[1].split(",")]
+        except ArithmeticError:
+            # Malformed number - let test_interval() raise the same error, when it gets there
+            return lambda number: selector.test_interval(number, interval)
+        integers = set(int(v) for v in values if v == v.to_integral_value())
+
+        def test(number):
+            if number.__class__ is int:
+                return number in integers
+            return Decimal(number) in values
+        return test
+
+    left = float(match.group('left'))
+    right = float(match.group('right'))
+    left_closed = '[' == match.group('left_delimiter')
+    right_closed = ']' == match.group('right_delimiter')
+
+    def test(number):
+        return (number >= left if left_closed else number > left) \
+            and (number <= right if right_closed else number < right)
+    return test
+
+
+class PluralSelector(object):
+    """
+    A message with plural forms parsed once for a given locale. select() gives exactly
+    the same result as python_translate.selector.select_message().
+    """
+
+    __slots__ = ('message', 'locale', 'intervals', 'standard_rules', 'is_single_part', 'rule_locale')
+
+    def __init__(self, message, locale):
+        self.message = message
+        self.locale = locale
+
+        parts = message.split("|")
+        explicit_rules = OrderedDict()
+        self.standard_rules = []
+        for part in parts:
+            part = part.strip()
+
+            match_interval = selector.INTERVAL_MESSAGE_REGEX.match(part)
+            match_standard = selector.STANDARD_RULES_REGEX.match(part)
+            if match_interval:
+                explicit_rules[match_interval.group('interval')] = match_interval.group('message')
+            elif match_standard:
+                self.standard_rules.append(match_standard.groups()[0])
+            else:
+                self.standard_rules.append(part)
+
+        self.intervals = [(_compile_interval(interval), m) for interval, m in list(explicit_rules.items())]
+        self.is_single_part = len(parts) == 1
+        # The rule itself is looked up on every call, PluralizationRules.set() may replace it at any time
+        self.rule_locale = get_rule_locale(locale)
+
+    def select(self, number):
+        """
+        @type number: int
+        @rtype: str
+        @raises: ValueError
+        """
+        for test, m in self.intervals:
+            if test(number):
+                return m
+
+        position = PluralizationRules._rules.get(self.rule_locale, _zero)(number)
+        if not isinstance(position, int) or position < 0:
+            position = 0
+        if len(self.standard_rules) <= position:
+            # when there's exactly one rule given, and that rule is a standard
+            # rule, use this rule
+            if self.is_single_part and len(self.standard_rules) > 0:
+                return self.standard_rules[0]
+            raise ValueError('Unable to choose a translation for "%s" with locale "%s" for value "%s". '
+                             'Double check that this translation has the correct plural options (e.g. '
+                             '"There is one apple|There are {{count}} apples").' % (self.message, self.locale, number))
+
+        return self.standard_rules[position]
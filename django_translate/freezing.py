@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Catalogues shared between processes of pre-fork servers, see settings.TRANZ_FREEZE_CATALOGUES
+
+Forked workers share memory of their parent until they write to it, but merely looking
+up a message writes to it: reference counts of the key and message strings change, and the
+garbage collector updates headers of every dict it scans. Sooner or later each worker ends
+up with a private copy of all catalogues.
+
+freeze() moves messages of every catalogue into FrozenMessages - a read-only string table
+in an anonymous shared memory map with an open addressing hash index - so no python object
+is left per message, and then moves all remaining objects out of the garbage collector's
+reach with gc.freeze().
+"""
+
+import gc
+import mmap
+import struct
+from array import array
+from zlib import crc32
+from collections.abc import Mapping
+
+from django_translate.translations import LazyMessageCatalogue
+
+# The buffer never leaves the process, native byte order is fine
+# count, number of slots, end of entries
+HEADER = struct.Struct("=QQQ")
+SLOT = struct.Struct("=Q")
+# length of lowercased id, length of id, length of message; followed by the three of them, utf-8 encoded
+ENTRY = struct.Struct("=III")
+
+
+class FrozenMessages(Mapping):
+    """
+    Read-only, case insensitive mapping of message ids to messages,
+    a drop-in replacement of python_translate.utils.CaseInsensitiveDict
+    """
+
+    __slots__ = ('_buffer', '_count', '_mask', '_end')
+
+    def __init__(self, messages):
+        """
+        @type messages: dict
+        @param messages: {lowercased id: (id, message)}, e.g. CaseInsensitiveDict._store
+        """
+        slots = 8
+        while slots < len(messages) * 2:
+            slots *= 2
+
+        table_offset = HEADER.size
+        entries = bytearray()
+        offsets = array("Q", [0]) * slots
+        entries_offset = table_offset + slots * SLOT.size
+        for lower, (id, message) in list(messages.items()):
+            lower = lower.encode("utf-8")
+            slot = crc32(lower) & (slots - 1)
+            while offsets[slot]:
+                slot = (slot + 1) & (slots - 1)
+            offsets[slot] = entries_offset + len(entries)
+
+            id = id.encode("utf-8")
+            message = message.encode("utf-8")
+            entries += ENTRY.pack(len(lower), len(id), len(message))
+            entries += lower + id + message
+
+        end = entries_offset + len(entries)
+        self._buffer = mmap.mmap(-1, max(end, 1))
+        HEADER.pack_into(self._buffer, 0, len(messages), slots, end)
+        self._buffer[table_offset:entries_offset] = offsets.tobytes()
+        self._buffer[entries_offset:end] = bytes(entries)
+
+        self._count = len(messages)
+        self._mask = slots - 1
+        self._end = end
+
+    def _find(self, id):
+        """
+        @rtype: int
+        @return: Offset of the entry, None if it's not there
+        """
+        lower = id.lower().encode("utf-8")
+        buffer = self._buffer
+        slot = crc32(lower) & self._mask
+        while True:
+            offset, = SLOT.unpack_from(buffer, HEADER.size + slot * SLOT.size)
+            if not offset:
+                return None
+            lower_length, _, _ = ENTRY.unpack_from(buffer, offset)
+            start = offset + ENTRY.size
+            if lower_length == len(lower) and buffer[start:start + lower_length] == lower:
+                return offset
+            slot = (slot + 1) & self._mask
+
+    def _read(self, offset):
+        lower_length, id_length, message_length = ENTRY.unpack_from(self._buffer, offset)
+        start = offset + ENTRY.size + lower_length
+        id = self._buffer[start:start + id_length].decode("utf-8")
+        start += id_length
+        return id, self._buffer[start:start + message_length].decode("utf-8"), start + message_length
+
+    def __getitem__(self, id):
+        offset = self._find(id) if isinstance(id, str) else None
+        if offset is None:
+            raise KeyError(id)
+        return self._read(offset)[1]
+
+    def __contains__(self, id):
+        return isinstance(id, str) and self._find(id) is not None
+
+    def __iter__(self):
+        offset = HEADER.size + (self._mask + 1) * SLOT.size
+        while offset < self._end:
+            id, _, offset = self._read(offset)
+            yield id
+
+    def __len__(self):
+        return self._count
+
+    def __repr__(self):
+        return "<FrozenMessages of {0} messages>".format(self._count)
+
+
+def freeze_catalogue(catalogue):
+    """
+    Replaces messages of every domain of a catalogue with FrozenMessages. Domains holding
+    anything else than strings are left as they are.
+
+    @type catalogue: MessageCatalogue
+    """
+    if isinstance(catalogue, LazyMessageCatalogue):
+        catalogue.load_all()
+
+    for domain, messages in list(catalogue.messages.items()):
+        if isinstance(messages, FrozenMessages):
+            continue
+        store = getattr(messages, "_store", None)
+        if store is None:
+            store = {id.lower(): (id, message) for id, message in list(messages.items())}
+        if all(isinstance(id, str) and isinstance(message, str) for id, message in list(store.values())):
+            catalogue.messages[domain] = FrozenMessages(store)
+
+
+def freeze(translator):
+    """
+    Loads catalogues of every locale translator has resources for, freezes them and then
+    freezes all objects tracked by the garbage collector (python >= 3.7).
+    Call it in the parent process, right before workers are forked.
+
+    @type translator: python_translate.translations.Translator
+    """
+    locales = set(translator.resources.keys()) | set(translator.fallback_locales)
+    if translator.locale:
+        locales.add(translator.locale)
+
+    for locale in sorted(locales):
+        translator.get_catalogue(locale)
+
+    for catalogue in list(translator.catalogues.values()):
+        freeze_catalogue(catalogue)
+
+    gc.collect()
+    if hasattr(gc, "freeze"):
+        gc.freeze()
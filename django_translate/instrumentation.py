@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Counting and timing of translations, see settings.TRANZ_INSTRUMENTATION
+
+Statistics are collected per context (a request, see middleware.TranslationStatsMiddleware,
+or a block of code, see collect()). When the setting is off, nothing in this module is
+wired into the translator, the {% tranz %} tags or patched django translation functions.
+"""
+
+import time
+from functools import wraps
+from contextlib import contextmanager
+
+try:
+    from contextvars import ContextVar
+except ImportError:
+    ContextVar = None
+
+from django_translate.translations import _ThreadLocalVar, FallbackIndexMixin
+
+_current = (ContextVar if ContextVar is not None else _ThreadLocalVar)("tranz_stats")
+
+
+class TranslationStats(object):
+    """
+    Translations done in a single context
+
+    lookups: every message looked up
+    misses: messages not found in the catalogue of their locale nor in any fallback one
+    fallback_hits: messages found only in a fallback catalogue
+    time: total time spent translating, in seconds
+    calls: {entry point: number of calls} of "trans", "transchoice", "template" ({% tranz %} tags)
+           and "gettext" (patched django functions); translations done inside another
+           entry point are not counted (nor timed) twice
+    """
+
+    __slots__ = ('lookups', 'misses', 'fallback_hits', 'time', 'calls', '_depth')
+
+    def __init__(self):
+        self.lookups = 0
+        self.misses = 0
+        self.fallback_hits = 0
+        self.time = 0.0
+        self.calls = {}
+        self._depth = 0
+
+    def record_lookup(self, translator, id, domain=None, locale=None):
+        """
+        Records a lookup of given message, telling whether it's found in its locale,
+        in a fallback one or not at all
+        """
+        domain = domain or 'messages'
+        locale = locale or translator.locale
+        index = None
+        if isinstance(translator, FallbackIndexMixin):
+            # The translator looks messages up in the index anyway, no need to walk fallback catalogues
+            try:
+                index = translator.get_fallback_index(domain, locale)
+            except ValueError:
+                # Invalid locale, the translator is going to complain about it
+                return
+
+        if index is not None:
+            lower = id.lower()
+            self.lookups += 1
+            if lower not in index.messages:
+                self.misses += 1
+            elif index.locales.get(lower, locale) != locale:
+                self.fallback_hits += 1
+            return
+
+        try:
+            catalogue = translator.get_catalogue(locale)
+        except ValueError:
+            # Invalid locale, the translator is going to complain about it
+            return
+
+        self.lookups += 1
+        if not catalogue.defines(id, domain):
+            if catalogue.has(id, domain):
+                self.fallback_hits += 1
+            else:
+                self.misses += 1
+
+    def as_dict(self):
+        return {
+            "lookups": self.lookups,
+            "misses": self.misses,
+            "fallback_hits": self.fallback_hits,
+            "time": self.time,
+            "calls": dict(self.calls),
+        }
+
+    def __str__(self):
+        return "lookups={0}; misses={1}; fallback_hits={2}; time={3:.3f}ms".format(
+            self.lookups, self.misses, self.fallback_hits, self.time * 1000)
+
+
+def get_stats():
+    """
+    @rtype: TranslationStats
+    @return: Statistics of current context, None if they are not collected
+    """
+    return _current.get(None)
+
+
+def start():
+    """
+    Starts collecting statistics in current context
+
+    @return: A token to be passed to stop()
+    """
+    return _current.set(TranslationStats())
+
+
+def stop(token):
+    """
+    @rtype: TranslationStats
+    @return: Statistics collected since start() returned given token
+    """
+    stats = _current.get(None)
+    _current.reset(token)
+    return stats
+
+
+@contextmanager
+def collect():
+    """
+    Collects statistics of translations done inside a with block:
+
+        with instrumentation.collect() as stats:
+            ...
+        print(stats.lookups)
+    """
+    token = start()
+    try:
+        yield _current.get(None)
+    finally:
+        stop(token)
+
+
+def instrument(kind, function):
+    """
+    Wraps a function so that its calls and time are recorded as entry point `kind`
+
+    @type kind: str
+    @type function: callable
+    @rtype: callable
+    """
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        stats = _current.get(None)
+        if stats is None or stats._depth:
+            return function(*args, **kwargs)
+
+        stats._depth = 1
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            stats.time += time.perf_counter() - start
+            stats._depth = 0
+            stats.calls[kind] = stats.calls.get(kind, 0) + 1
+    return wrapper
+
+
+def instrument_gettext(translator, translate_into):
+    """
+    Wraps services.monkeypatch_django()'s translate_into(locale, message), which serves
+    most messages from the flattened "django" domain without calling translator.trans()
+    """
+    translate_into = instrument("gettext", translate_into)
+
+    @wraps(translate_into)
+    def wrapper(locale, message):
+        stats = _current.get(None)
+        if stats is None:
+            return translate_into(locale, message)
+
+        lookups = stats.lookups
+        result = translate_into(locale, message)
+        if stats.lookups == lookups:
+            stats.record_lookup(translator, message, 'django', locale)
+        return result
+    return wrapper
+
+
+class InstrumentedMixin(object):
+    """
+    Records every trans() and transchoice() call in statistics of current context
+    """
+
+    def trans(self, id, parameters=None, domain=None, locale=None):
+        stats = _current.get(None)
+        if stats is None:
+            return super(InstrumentedMixin, self).trans(id, parameters, domain, locale)
+        stats.record_lookup(self, id, domain, locale)
+        return _trans(self, id, parameters, domain, locale)
+
+    def transchoice(self, id, number, parameters=None, domain=None, locale=None):
+        stats = _current.get(None)
+        if stats is None:
+            return super(InstrumentedMixin, self).transchoice(id, number, parameters, domain, locale)
+        stats.record_lookup(self, id, domain, locale)
+        return _transchoice(self, id, number, parameters, domain, locale)
+
+
+_trans = instrument("trans", lambda self, *args: super(InstrumentedMixin, self).trans(*args))
+_transchoice = instrument("transchoice", lambda self, *args: super(InstrumentedMixin, self).transchoice(*args))
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Lazy translations used by django_translate.services.monkeypatch_django()
+
+django.utils.functional.lazy() evaluates the wrapped function every time a proxy is
+converted to a string. LazyTranslation does the lookup the first time it's needed in
+a given locale and remembers the result until translator catalogues are reloaded
+(see TranslatorMixin.catalogues_version).
+"""
+
+from django.utils.functional import Promise
+
+
+class LazyTranslation(Promise):
+    """
+    A string translated only when it's used, in the locale active at that moment.
+    Behaves like django's lazy proxies: it may be converted with str() (or force_text()),
+    compared, hashed, concatenated and formatted.
+    """
+
+    def __init__(self, translator, get_locale, translate, *args):
+        """
+        @type translator: python_translate.translations.Translator
+        @param translator: Translator whose catalogues_version tells whether cached results are still valid
+
+        @type get_locale: callable
+        @param get_locale: () -> locale to translate into
+
+        @type translate: callable
+        @param translate: (locale, *args) -> str
+        """
+        self._translator = translator
+        self._get_locale = get_locale
+        self._translate = translate
+        self._args = args
+        self._results = {}
+
+    def _evaluate(self):
+        locale = self._get_locale()
+        version = getattr(self._translator, 'catalogues_version', None)
+        result = self._results.get(locale)
+        if result is None or result[0] != version:
+            result = self._results[locale] = (version, self._translate(locale, *self._args))
+        return result[1]
+
+    def __str__(self):
+        return self._evaluate()
+
+    def __repr__(self):
+        return "<{0} {1!r}>".format(self.__class__.__name__, self._args)
+
+    def __getattr__(self, name):
+        # Delegate str methods (format, upper, replace...) to the translated string. Private and special
+        # names are excluded, so that copy, pickle or hasattr(obj, '__html__') do not trigger a translation
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._evaluate(), name)
+
+    def __reduce__(self):
+        # Neither translator nor callables survive pickling, the translated string does
+        return str, (self._evaluate(), )
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        memo[id(self)] = self
+        return self
+
+    def __hash__(self):
+        return hash(self._evaluate())
+
+    def __eq__(self, other):
+        if isinstance(other, Promise):
+            other = str(other)
+        return self._evaluate() == other
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __lt__(self, other):
+        if isinstance(other, Promise):
+            other = str(other)
+        return self._evaluate() < other
+
+    def __le__(self, other):
+        return self.__lt__(other) or self.__eq__(other)
+
+    def __gt__(self, other):
+        return not self.__le__(other)
+
+    def __ge__(self, other):
+        return not self.__lt__(other)
+
+    def __bool__(self):
+        return bool(self._evaluate())
+
+    def __len__(self):
+        return len(self._evaluate())
+
+    def __iter__(self):
+        return iter(self._evaluate())
+
+    def __contains__(self, item):
+        return item in self._evaluate()
+
+    def __getitem__(self, key):
+        return self._evaluate()[key]
+
+    def __add__(self, other):
+        return self._evaluate() + str(other)
+
+    def __radd__(self, other):
+        return str(other) + self._evaluate()
+
+    def __mul__(self, other):
+        return self._evaluate() * other
+
+    __rmul__ = __mul__
+
+    def __mod__(self, rhs):
+        return self._evaluate() % rhs
+
+    def __format__(self, format_spec):
+        return format(self._evaluate(), format_spec)
+
+
+class LazyPluralTranslation(LazyTranslation):
+    """
+    Lazy counterpart of ngettext(). Like in django, the number may be a name of a
+    parameter which is taken from the dict the translation is formatted with:
+
+        ngettext_lazy("%(count)s apple", "%(count)s apples", "count") % {"count": 3}
+    """
+
+    def __init__(self, translator, get_locale, translate, singular, plural, number):
+        """
+        @type translate: callable
+        @param translate: (locale, singular, plural, number) -> str
+        """
+        super(LazyPluralTranslation, self).__init__(translator, get_locale, translate, singular, plural, number)
+
+    def __mod__(self, rhs):
+        singular, plural, number = self._args
+        if isinstance(number, int):
+            return super(LazyPluralTranslation, self).__mod__(rhs)
+
+        if isinstance(rhs, dict) and number:
+            try:
+                number_value = rhs[number]
+            except KeyError:
+                raise KeyError(
+                    "Your dictionary lacks key '%s'. Please provide "
+                    "it, because it is required to determine whether "
+                    "string is singular or plural." % number
+                )
+        else:
+            number_value = rhs
+
+        translated = self._translate(self._get_locale(), singular, plural, number_value)
+        try:
+            translated = translated % rhs
+        except TypeError:
+            # String doesn't contain a placeholder for the number
+            pass
+        return translated
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+
+import os
+import os.path
+import time
+from collections import OrderedDict
+
+from django.core.management.base import BaseCommand
+
+from django_translate.utils import bcolors
+from django_translate import services
+from django_translate import settings
+from django_translate import snapshots
+
+
+class Command(BaseCommand):
+
+    help = """Compiles all discovered translation files into one snapshot per locale. Snapshots are loaded
+              instead of source files as long as none of the source files has changed.
+
+              Example:
+                  ./manage.py tranzcompile
+                  ./manage.py tranzcompile -l en -l fr --output-dir ./var/tranz
+              """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--locale', '-l', default=[], dest='locales', action='append',
+                            help='Locale to compile. Default is all. Can be used multiple times.')
+
+        parser.add_argument('--output-dir', dest='output_dir', default=None, action='store',
+                            help='Override the default output dir (TRANZ_SNAPSHOT_DIR)')
+
+    def handle(self, *args, **options):
+        output_dir = options.get('output_dir') or settings.TRANZ_SNAPSHOT_DIR
+        if not output_dir:
+            print((bcolors.WARNING + 'You must provide an --output-dir or set TRANZ_SNAPSHOT_DIR '
+                                     'settings variable.' + bcolors.ENDC))
+            return
+
+        by_locale = OrderedDict()
+        for format, path, locale, domain in services.discover_resources():
+            by_locale.setdefault(locale, []).append((format, path, domain))
+
+        locales = options.get('locales') or list(by_locale.keys())
+        for locale in locales:
+            if locale not in by_locale:
+                print((bcolors.WARNING + 'No translation files found for locale "{0}"'.format(locale) + bcolors.ENDC))
+                continue
+
+            path = snapshots.get_snapshot_path(output_dir, locale)
+            start = time.time()
+            counts = snapshots.write_snapshot(path, locale, by_locale[locale], settings.TRANZ_LOADERS)
+            print(('Compiled {0} messages in {1} domains from {2} files into {3} ({4:.0f} ms)'.format(
+                sum(counts.values()), len(counts), len(by_locale[locale]), path, (time.time() - start) * 1000
+            )))
+
+        if output_dir != settings.TRANZ_SNAPSHOT_DIR:
+            print((bcolors.WARNING + 'Snapshots are only used when TRANZ_SNAPSHOT_DIR points to '
+                                     '{0}'.format(os.path.abspath(output_dir)) + bcolors.ENDC))
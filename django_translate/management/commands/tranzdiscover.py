@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from django_translate.utils import bcolors
+from django_translate import discovery
+from django_translate import services
+from django_translate import settings
+
+
+class Command(BaseCommand):
+
+    help = """Lists translation files discovered by django_translate and how long the discovery takes.
+              When TRANZ_DISCOVERY_MANIFEST is set, the manifest is rebuilt as well.
+
+              Example:
+                  ./manage.py tranzdiscover
+              """
+
+    def handle(self, *args, **options):
+        start = time.time()
+        resources = services.discover_resources(use_manifest=False)
+        elapsed = time.time() - start
+
+        for format, path, locale, domain in sorted(resources, key=lambda r: (r[2], r[3], r[1])):
+            print(("{0:<8} {1:<20} {2:<6} {3}".format(locale, domain, format, path)))
+
+        print("")
+        print(("Found {0} translation files in {1} locales".format(
+            len(resources), len(set(r[2] for r in resources)))))
+        print(("Scanning directories took {0:.2f} ms".format(elapsed * 1000)))
+
+        if not settings.TRANZ_DISCOVERY_MANIFEST:
+            return
+
+        start = time.time()
+        from_manifest = discovery.read_manifest(settings.TRANZ_DISCOVERY_MANIFEST,
+                                                list(services.get_discovery_options()))
+        elapsed = time.time() - start
+        if from_manifest is not None:
+            print(("Reading manifest {0} took {1:.2f} ms".format(settings.TRANZ_DISCOVERY_MANIFEST, elapsed * 1000)))
+        else:
+            print((bcolors.WARNING + "Manifest {0} was not written, some of the directories were modified "
+                                     "less than {1} seconds ago".format(settings.TRANZ_DISCOVERY_MANIFEST,
+                                                                      discovery.MTIME_SAFETY_MARGIN) + bcolors.ENDC))
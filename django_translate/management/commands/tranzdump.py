@@ -6,6 +6,7 @@ import os.path
 import re
 import sys
 import string
+from concurrent.futures import ThreadPoolExecutor
 
 from django.apps.registry import apps
 from django.core.management.base import BaseCommand, CommandError
@@ -13,9 +14,12 @@ from python_translate.extractors import base as extractors
 from python_translate import operations
 from python_translate.translations import MessageCatalogue
 
+import django_translate
 from django_translate.utils import bcolors
+from django_translate import extraction
 from django_translate import services
 from django_translate import settings
+from django_translate import writing
 
 
 class AnyFormatSpec:
@@ -43,18 +47,22 @@ class Command(BaseCommand):
               Example running against app folder
                   ./manage.py tranzdump -l en --path ./ --output-path ./tranz
                   ./manage.py tranzdump -l fr --force --prefix="new_" --app website --exclude ./website/static
+                  ./manage.py tranzdump -l all --force --app website
               """
 
     def __init__(self, stdout=None, stderr=None, no_color=False):
         self.excluded_paths = None
-        self.locale = None
+        self.locales = None
         self.verbosity = None
+        self.jobs = 1
+        self.cache = None
         super(Command, self).__init__(stdout, stderr, no_color)
 
 
     def add_arguments(self, parser):
-        parser.add_argument('--locale', '-l', default='en', dest='locale', action='store',
-                            help='Locale to process')
+        parser.add_argument('--locale', '-l', default=[], dest='locales', action='append',
+                            help='Locale to process, "en" by default. Can be used multiple times or hold a comma separated '
+                                 'list. "all" processes every locale of TRANZ_LANGUAGES.')
 
         parser.add_argument('--app', '-a', dest='app', action='store',
                             help='App to scan.')
@@ -87,6 +95,12 @@ class Command(BaseCommand):
         parser.add_argument('--clean', dest='clean', default=False, action='store_true',
                             help='Should clean not found messages',)
 
+        parser.add_argument('--jobs', '-j', dest='jobs', default=1, type=int, action='store',
+                            help='Number of processes extracting messages in parallel, 0 means one per CPU')
+
+        parser.add_argument('--cache-dir', dest='cache_dir', default=None, action='store',
+                            help='Directory of a cache of extracted translations, unchanged files are not processed again')
+
     def handle(self, *args, **options):
         if options.get('force') != True and options.get('dump_messages') != True:
             print((bcolors.WARNING + 'You must choose at least one of --force or --dump-messages' + bcolors.ENDC))
@@ -101,9 +115,10 @@ class Command(BaseCommand):
                                     'settings variable is False.' + bcolors.ENDC))
             return
 
-        self.excluded_paths = [os.path.abspath(path) for path in options['excluded_paths']]
-        self.excluded_paths += [os.path.abspath(django_translate.__path__[0])]
-        self.excluded_paths += settings.TRANZ_EXCLUDED_DIRS
+        self.excluded_paths = extraction.compile_excluded_paths(
+            options['excluded_paths'] + [django_translate.__path__[0]] + list(settings.TRANZ_EXCLUDED_DIRS))
+        self.jobs = extraction.get_jobs(options['jobs'])
+        self.cache = extraction.ExtractionCache(options['cache_dir']) if options.get('cache_dir') else None
 
         # Find directories to scan
         if options.get('app'):
@@ -121,84 +136,150 @@ class Command(BaseCommand):
         output_dir = options.get('output_dir') or os.path.join(root_path, 'tranz')
         writer = services.writer
 
-        print(('Generating "{0}" translation files for "{1}"'.format(options.get('locale'), current_name)))
+        self.locales = self.get_locales(options['locales'])
+        print(('Generating "{0}" translation files for "{1}"'.format(", ".join(self.locales), current_name)))
 
         print("Loading existing messages")
-        current_catalogue = MessageCatalogue(options['locale'])
-        loader = services.loader
-        loader.load_messages(output_dir, current_catalogue)
-        if len(current_catalogue.messages) == 0:
+        with ThreadPoolExecutor(max_workers=self.get_threads()) as pool:
+            current_catalogues = list(pool.map(lambda locale: self.load_messages(output_dir, locale), self.locales))
+
+        for current_catalogue in [c for c in current_catalogues if len(c.messages) == 0]:
+            if len(self.locales) > 1:
+                print((bcolors.WARNING + 'No messages were loaded for "{0}", skipping it'.format(current_catalogue.locale) + bcolors.ENDC))
+            current_catalogues.remove(current_catalogue)
+
+        if not current_catalogues:
             print(("No messages were loaded, make sure there actually are " \
                   "translation file in format {{catalog}}.{{locale}}.{{format}} in {0}".format(output_dir)))
             return
 
         print("Extracting messages")
-        extracted_catalogue = MessageCatalogue(options['locale'])
+        extracted_catalogue = MessageCatalogue(self.locales[0])
         extractor = services.extractor
         extractor.set_prefix(options['prefix'])
-        self.extract_messages(extractor, root_path, extracted_catalogue)
+        try:
+            self.extract_messages(extractor, root_path, extracted_catalogue)
+        finally:
+            self.close_cache()
 
         print("Processing catalogues")
+        if options["no_backup"]:
+            writer.disable_backup()
+
+        # Extracted messages are the same for every locale, only the catalogue they are merged into differs
+        with ThreadPoolExecutor(max_workers=self.get_threads()) as pool:
+            outputs = list(pool.map(
+                lambda current_catalogue: self.process_locale(current_catalogue, extracted_catalogue, output_dir, options),
+                current_catalogues
+            ))
+
+        stats = writing.WriteStats()
+        for output, locale_stats in outputs:
+            for line in output:
+                print(line)
+            stats.update(locale_stats)
+
+        if options["force"]:
+            print(("Wrote {0} files ({1} bytes), skipped {2} unchanged files".format(
+                len(stats.written), stats.bytes_written, len(stats.skipped))))
+
+    def get_locales(self, values):
+        """
+        @type values: list
+        @param values: Values of --locale options
+
+        @rtype: list
+        """
+        locales = []
+        for value in values or ['en']:
+            for locale in value.split(","):
+                locale = locale.strip()
+                if locale == 'all':
+                    locale = [l[0] for l in settings.TRANZ_LANGUAGES]
+                else:
+                    locale = [locale] if locale else []
+                locales += [l for l in locale if l not in locales]
+
+        if not locales:
+            raise CommandError("No locales to process, TRANZ_LANGUAGES is empty")
+        return locales
+
+    def get_threads(self):
+        return max(1, min(len(self.locales), os.cpu_count() or 1))
+
+    def load_messages(self, output_dir, locale):
+        current_catalogue = MessageCatalogue(locale)
+        services.loader.load_messages(output_dir, current_catalogue)
+        return current_catalogue
+
+    def process_locale(self, current_catalogue, extracted_catalogue, output_dir, options):
+        """
+        Merges extracted messages into current messages of one locale and writes the result
+
+        @type current_catalogue: MessageCatalogue
+        @type extracted_catalogue: MessageCatalogue
+
+        @rtype: tuple
+        @return: Lines to print, WriteStats
+        """
+        locale = current_catalogue.locale
+        # Operations work only on catalogues of the same locale
+        target = MessageCatalogue(locale)
+        for domain in extracted_catalogue.get_domains():
+            target.add(extracted_catalogue.all(domain), domain)
+
         operation_class = operations.DiffOperation if options['clean'] else operations.MergeOperation
-        operation = operation_class(current_catalogue, extracted_catalogue)
+        operation = operation_class(current_catalogue, target)
 
+        output = []
+        stats = writing.WriteStats()
+        prefix = '[{0}] '.format(locale) if len(self.locales) > 1 else ''
         if not len(operation.get_domains()):
-            print("No translations found")
-            return
+            output.append(prefix + "No translations found")
+            return output, stats
 
         if options["dump_messages"]:
             for domain in operation.get_domains():
-                print(("Displaying messages for domain {0}".format(domain)))
+                output.append(prefix + "Displaying messages for domain {0}".format(domain))
                 new_keys = list(operation.get_new_messages(domain).keys())
                 all_keys = list(operation.get_messages(domain).keys())
                 for id in set(all_keys).difference(new_keys):
-                    print(id)
+                    output.append(id)
 
                 for id in new_keys:
-                    print((bcolors.OKGREEN + id + bcolors.ENDC))
+                    output.append(bcolors.OKGREEN + id + bcolors.ENDC)
 
                 for id in list(operation.get_obsolete_messages(domain).keys()):
-                    print((bcolors.FAIL + id + bcolors.ENDC))
-
-        if options["no_backup"]:
-            writer.disable_backup()
+                    output.append(bcolors.FAIL + id + bcolors.ENDC)
 
         if options["force"]:
-            print(("Writing files to {0}".format(output_dir)))
-            writer.write_translations(operation.get_result(), options['format'], {
-                "path": output_dir,
-                "default_locale": options['locale']
-            })
+            output.append(prefix + "Writing files to {0}".format(output_dir))
+            stats = writing.write_translations(services.writer, operation.get_result(), options['format'], output_dir)
+            for path in stats.written:
+                output.append(prefix + "Updated {0}".format(os.path.basename(path)))
+        return output, stats
 
     def extract_messages(self, extractor, root_path, extracted_catalogue):
-        if isinstance(extractor, extractors.ChainExtractor):
-            subextractors = list(extractor._extractors.values())
-        else:
-            subextractors = [extractor]
-
-        for subextractor in subextractors:
+        for subextractor in extraction.get_subextractors(extractor):
             if not isinstance(subextractor, extractors.BaseExtractor):
                 subextractor.extract(root_path, extracted_catalogue)
                 continue
 
-            paths = subextractor.extract_files(root_path)
-            paths = self.filter_exluded_paths(paths)
-            for path in paths:
-                try:
-                    subextractor.extract([path], extracted_catalogue)
-                except Exception as e:
-                    exc_type, exc_value, exc_traceback = sys.exc_info()
-                    msg = 'There was an exception in extractor {0} when processing ' \
-                          'resource "{1}"'.format(type(subextractor).__name__, path)
-                    msg = msg + "\nOriginal message: {0} {1}".format(exc_type.__name__, exc_value)
-                    raise ValueError(msg).with_traceback(exc_traceback)
-
-    def filter_exluded_paths(self, paths):
-        valid = []
-        for path in paths:
-            for excluded in self.excluded_paths:
-                if path.startswith(excluded):
-                    break
-            else:
-                valid.append(path)
-        return valid
+            paths = extraction.list_files(subextractor, root_path, self.excluded_paths)
+            if not extraction.uses_default_extract(subextractor):
+                # Custom extract() method, files can't be processed separately from the catalogue
+                for path in paths:
+                    try:
+                        subextractor.extract([path], extracted_catalogue)
+                    except Exception as e:
+                        extraction.raise_extraction_error(subextractor, path)
+                continue
+
+            for path, translations in extraction.extract_files(subextractor, paths, self.jobs, self.cache):
+                extraction.add_to_catalogue(subextractor, translations, extracted_catalogue)
+
+    def close_cache(self):
+        if self.cache is None:
+            return
+        self.cache.close()
+        print(("{0} files taken from cache, {1} extracted".format(self.cache.hits, self.cache.misses)))
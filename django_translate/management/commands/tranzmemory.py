@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+
+from django.core.management.base import BaseCommand
+
+from django_translate.utils import bcolors
+from django_translate.translations import LazyMessageCatalogue
+from django_translate import compact
+from django_translate import services
+from django_translate import settings
+
+
+class Command(BaseCommand):
+
+    help = """Loads catalogues of all locales the way the application does and reports memory
+              used by messages of each locale and domain.
+
+              Example:
+                  ./manage.py tranzmemory
+                  ./manage.py tranzmemory -l en -l fr
+              """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--locale', '-l', default=[], dest='locales', action='append',
+                            help='Locale to measure. Default is all. Can be used multiple times.')
+
+    def handle(self, *args, **options):
+        translator = services.translator
+        locales = options.get('locales') or sorted(translator.resources.keys())
+
+        seen = set()
+        total = 0
+        print(('{0:<14}{1:<24}{2:>12}{3:>16}'.format("Locale", "Domain", "Messages", "Bytes")))
+        for locale in locales:
+            if locale not in translator.resources:
+                print((bcolors.WARNING + 'No translation files found for locale "{0}"'.format(locale) + bcolors.ENDC))
+                continue
+
+            catalogue = translator.get_catalogue(locale)
+            if isinstance(catalogue, LazyMessageCatalogue):
+                catalogue.load_all()
+
+            locale_total = 0
+            for domain, messages in sorted(catalogue.messages.items()):
+                size = compact.measure_messages(messages, seen)
+                locale_total += size
+                print(('{0:<14}{1:<24}{2:>12}{3:>16}'.format(locale, domain, len(messages), size)))
+            print((bcolors.BOLD + '{0:<14}{1:<24}{2:>12}{3:>16}'.format(
+                locale, "total", sum(len(messages) for messages in list(catalogue.messages.values())),
+                locale_total) + bcolors.ENDC))
+            total += locale_total
+
+        for domain, table in sorted(getattr(translator, "id_tables", {}).items()):
+            size = compact.measure_id_table(table, seen)
+            total += size
+            print(('{0:<14}{1:<24}{2:>12}{3:>16}'.format("(shared ids)", domain, len(table), size)))
+
+        print(("Messages use {0} bytes in total".format(total)))
+        if not settings.TRANZ_COMPACT_CATALOGUES:
+            print((bcolors.OKBLUE + 'Set TRANZ_COMPACT_CATALOGUES to store ids shared by all locales only '
+                                    'once' + bcolors.ENDC))
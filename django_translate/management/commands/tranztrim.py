@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+
+import os
+import os.path
+from collections import OrderedDict
+
+from django.apps.registry import apps
+from django.core.management.base import BaseCommand, CommandError
+from python_translate.extractors import base as extractors
+from python_translate.translations import MessageCatalogue
+
+import django_translate
+from django_translate.utils import bcolors
+from django_translate.translations import merge_catalogue
+from django_translate import extraction
+from django_translate import services
+from django_translate import settings
+from django_translate import usage
+from django_translate import writing
+
+
+class Command(BaseCommand):
+
+    help = """Writes catalogues holding only messages which are in use: recorded at runtime (see TRANZ_USAGE_DIR)
+              or referenced by templates and python files of given apps or paths.
+
+              Example:
+                  ./manage.py tranztrim --output-dir ./var/tranz --app website
+                  ./manage.py tranztrim --output-dir ./var/tranz --usage-dir ./var/usage --path ./ -l en -l fr
+              """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', dest='output_dir', default=None, action='store',
+                            help='Where trimmed catalogues are written to')
+
+        parser.add_argument('--usage-dir', dest='usage_dir', default=None, action='store',
+                            help='Override the default usage recordings dir (TRANZ_USAGE_DIR)')
+
+        parser.add_argument('--locale', '-l', default=[], dest='locales', action='append',
+                            help='Locale to trim. Default is all. Can be used multiple times.')
+
+        parser.add_argument('--app', '-a', default=[], dest='apps', action='append',
+                            help='App whose messages are kept. Can be used multiple times.')
+
+        parser.add_argument('--path', '-p', default=[], dest='paths', action='append',
+                            help='Path whose messages are kept. Can be used multiple times.')
+
+        parser.add_argument('--exclude-dir', '-x', default=[], dest='excluded_paths', action='append',
+                            help='Paths to exclude. Default is none. Can be used multiple times.')
+
+        parser.add_argument('--format', dest='format', default="json", action='store',
+                            help='Override the default output format')
+
+        parser.add_argument('--jobs', '-j', dest='jobs', default=1, type=int, action='store',
+                            help='Number of processes extracting messages in parallel, 0 means one per CPU')
+
+    def handle(self, *args, **options):
+        output_dir = options.get('output_dir')
+        if not output_dir:
+            print((bcolors.WARNING + 'You must provide an --output-dir' + bcolors.ENDC))
+            return
+
+        usage_dir = options.get('usage_dir') or settings.TRANZ_USAGE_DIR
+        live = set()
+        if usage_dir:
+            counts = usage.read_usage(usage_dir)
+            live.update((domain, id.lower()) for locale, domain, id in counts)
+            print(("Loaded {0} keys recorded in {1}".format(len(counts), usage_dir)))
+
+        roots = [os.path.abspath(path) for path in options['paths']]
+        for name in options['apps']:
+            for app in list(apps.app_configs.values()):
+                if app.name == name:
+                    roots.append(app.path)
+                    break
+            else:
+                raise CommandError("App {0} not found".format(name))
+
+        if roots:
+            excluded = extraction.compile_excluded_paths(
+                options['excluded_paths'] + [django_translate.__path__[0]] + list(settings.TRANZ_EXCLUDED_DIRS))
+            extracted = self.extract_keys(roots, excluded, extraction.get_jobs(options['jobs']))
+            live.update(extracted)
+            print(("Extracted {0} keys from {1}".format(len(extracted), ", ".join(roots))))
+
+        if not live:
+            print((bcolors.WARNING + 'No keys are known to be in use, record them with TRANZ_USAGE_DIR '
+                                     'or pass --app or --path' + bcolors.ENDC))
+            return
+
+        by_locale = OrderedDict()
+        for format, path, locale, domain in services.discover_resources():
+            by_locale.setdefault(locale, []).append((format, path, domain))
+
+        stats = writing.WriteStats()
+        for locale in options.get('locales') or list(by_locale.keys()):
+            if locale not in by_locale:
+                print((bcolors.WARNING + 'No translation files found for locale "{0}"'.format(locale) + bcolors.ENDC))
+                continue
+
+            catalogue = self.load_catalogue(locale, by_locale[locale])
+            trimmed = MessageCatalogue(locale)
+            total = 0
+            for domain in catalogue.get_domains():
+                messages = catalogue.all(domain)
+                total += len(messages)
+                kept = dict((id, message) for id, message in list(messages.items()) if (domain, id.lower()) in live)
+                if kept:
+                    trimmed.add(kept, domain)
+
+            stats.update(writing.write_translations(services.writer, trimmed, options['format'], output_dir))
+            print(('{0}: kept {1} of {2} messages'.format(
+                locale, sum(len(trimmed.all(domain)) for domain in trimmed.get_domains()), total)))
+
+        print(("Wrote {0} files ({1} bytes) to {2}, skipped {3} unchanged files".format(
+            len(stats.written), stats.bytes_written, output_dir, len(stats.skipped))))
+
+    def extract_keys(self, roots, excluded, jobs):
+        """
+        @rtype: set
+        @return: (domain, lowercased id) of every message referenced with a literal id
+        """
+        keys = set()
+        for root_path in roots:
+            for subextractor in extraction.get_subextractors(services.extractor):
+                if not isinstance(subextractor, extractors.BaseExtractor):
+                    continue
+
+                paths = extraction.list_files(subextractor, root_path, excluded)
+                for path, translations in extraction.extract_files(subextractor, paths, jobs):
+                    for t in translations:
+                        if not t.id or not t.id.is_literal:
+                            continue
+                        domain = "messages" if not t.domain or not t.domain.is_literal else t.domain.value
+                        keys.add((domain, t.id.value.lower()))
+        return keys
+
+    def load_catalogue(self, locale, resources):
+        catalogue = MessageCatalogue(locale)
+        for format, path, domain in resources:
+            merge_catalogue(catalogue, settings.TRANZ_LOADERS[format].load(path, locale, domain))
+        return catalogue
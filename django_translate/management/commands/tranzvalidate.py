@@ -15,6 +15,7 @@ from python_translate.translations import MessageCatalogue
 
 import django_translate
 from django_translate.utils import bcolors
+from django_translate import extraction
 from django_translate import services
 from django_translate import settings
 
@@ -48,6 +49,8 @@ class Command(BaseCommand):
         self.excluded_paths = None
         self.locale = None
         self.verbosity = None
+        self.jobs = 1
+        self.cache = None
 
         super(Command, self).__init__(stdout, stderr, no_color)
 
@@ -69,6 +72,11 @@ class Command(BaseCommand):
                             help='Paths to exclude. Default is none. Can be used multiple times. '
                                  'Works only with ChainExtractor.')
 
+        parser.add_argument('--jobs', '-j', dest='jobs', default=1, type=int, action='store',
+                            help='Number of processes extracting translations in parallel, 0 means one per CPU')
+
+        parser.add_argument('--cache-dir', dest='cache_dir', default=None, action='store',
+                            help='Directory of a cache of extracted translations, unchanged files are not processed again')
 
     def handle(self, *args, **options):
         if not (bool(options.get('app')) ^ bool(options.get('path'))):
@@ -80,11 +88,12 @@ class Command(BaseCommand):
                                     'settings variable is False.' + bcolors.ENDC))
             return
 
-        self.excluded_paths = [os.path.abspath(path) for path in options['excluded_paths']]
-        self.excluded_paths += [os.path.abspath(django_translate.__path__[0])]
-        self.excluded_paths += settings.TRANZ_EXCLUDED_DIRS
+        self.excluded_paths = extraction.compile_excluded_paths(
+            options['excluded_paths'] + [django_translate.__path__[0]] + list(settings.TRANZ_EXCLUDED_DIRS))
         self.locale = options['locale']
         self.verbosity = options['verbosity']
+        self.jobs = extraction.get_jobs(options['jobs'])
+        self.cache = extraction.ExtractionCache(options['cache_dir']) if options.get('cache_dir') else None
 
         # Find directories to scan
         if options.get('app'):
@@ -111,7 +120,10 @@ class Command(BaseCommand):
             return
 
         print("Extracting translations")
-        translations = self.extract_translations(services.extractor, root_path)
+        try:
+            translations = self.extract_translations(services.extractor, root_path)
+        finally:
+            self.close_cache()
         if len(translations) == 0:
             print(("No messages were extracted, from {0} using {1}".format(root_path, services.extractor.__class__.__name__)))
             return
@@ -119,33 +131,16 @@ class Command(BaseCommand):
         self.validate_translations(translations, current_catalogue)
 
     def extract_translations(self, extractor, root_path):
-        if isinstance(extractor, extractors.ChainExtractor):
-            subextractors = list(extractor._extractors.values())
-        else:
-            subextractors = [extractor]
-
         translations = []
 
-        for subextractor in subextractors:
+        for subextractor in extraction.get_subextractors(extractor):
             if not isinstance(subextractor, extractors.BaseExtractor):
                 print(("Skipping extractor ", subextractor.__type__.__name__))
                 continue
 
-            paths = subextractor.extract_files(root_path)
-            paths = self.filter_exluded_paths(paths)
-            for path in paths:
-                try:
-                    with open(path, 'r') as f:
-                        batch = subextractor.extract_translations(f.read())
-                        for t in batch:
-                            t.file = path
-                        translations += batch
-                except Exception as e:
-                    exc_type, exc_value, exc_traceback = sys.exc_info()
-                    msg = 'There was an exception in extractor {0} when processing ' \
-                          'resource "{1}"'.format(type(subextractor).__name__, path)
-                    msg = msg + "\nOriginal message: {0} {1}".format(exc_type.__name__, exc_value)
-                    raise ValueError(msg).with_traceback(exc_traceback)
+            paths = extraction.list_files(subextractor, root_path, self.excluded_paths)
+            for path, batch in extraction.extract_files(subextractor, paths, self.jobs, self.cache):
+                translations += batch
         return translations
 
     def validate_translations(self, translations, current_catalogue):
@@ -184,7 +179,7 @@ class Command(BaseCommand):
                             
                         if formatter.used != parameters:
                             warnings.append(["Expected/received parameters mismatch, (expected: {0}), (received: {1})".format(
-                                ", ".join(formatter.used), ", ".join(parameters)
+                                ", ".join(str(key) for key in formatter.used), ", ".join(parameters)
                             ), t])
 
                     if t.is_transchoice and t.number is None:
@@ -202,15 +197,11 @@ class Command(BaseCommand):
         else:
             print((bcolors.FAIL + "{0} problems found".format(self.flushed) + bcolors.ENDC))
 
-    def filter_exluded_paths(self, paths):
-        valid = []
-        for path in paths:
-            for excluded in self.excluded_paths:
-                if path.startswith(excluded):
-                    break
-            else:
-                valid.append(path)
-        return valid
+    def close_cache(self):
+        if self.cache is None:
+            return
+        self.cache.close()
+        print(("{0} files taken from cache, {1} extracted".format(self.cache.hits, self.cache.misses)))
 
     def flush_warnings(self, file, warnings):
         if not len(warnings):
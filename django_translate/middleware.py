@@ -1,19 +1,137 @@
 # -*- coding: utf-8 -*-
 
+import asyncio
+import logging
+
 try:
     from django.utils.deprecation import MiddlewareMixin as BaseClass
 except ImportError:
     BaseClass = object
 
 from django_translate.services import translator as django_translator
+from django_translate import instrumentation
+from django_translate import settings
+from django_translate import signals
+
+logger = logging.getLogger("django_translate.instrumentation")
+
+
+def _activate(request):
+    if not hasattr(request, 'LANGUAGE_CODE'):
+        raise RuntimeError('django.middleware.locale.LocaleMiddleware is required '
+                           'in order to use django_translate.middleware.LocaleMiddleware ')
+    return django_translator.activate(request.LANGUAGE_CODE)
+
+
+def _deactivate(token):
+    try:
+        django_translator.deactivate(token)
+    except (ValueError, RuntimeError):
+        # Token was created in a different context, or has already been used
+        pass
+
 
 class LocaleMiddleware(BaseClass):
     """
     This is a very simple middleware that parses a request
-    and decides what locale to activate in current django_translator
+    and decides what locale to activate in current django_translator.
+
+    The locale is only active in the context of current request, so
+    concurrent requests handled by other threads are not affected.
     """
     def process_request(self, request):
-        if not hasattr(request, 'LANGUAGE_CODE'):
-            raise RuntimeError('django.middleware.locale.LocaleMiddleware is required '
-                               'in order to use django_translate.middleware.LocaleMiddleware ')
-        django_translator.locale = request.LANGUAGE_CODE
+        request._tranz_locale_token = _activate(request)
+
+    def process_response(self, request, response):
+        token = getattr(request, '_tranz_locale_token', None)
+        if token is not None:
+            _deactivate(token)
+            request._tranz_locale_token = None
+        return response
+
+
+def locale_middleware(get_response):
+    """
+    Same as LocaleMiddleware, but supports both WSGI and ASGI (native async)
+    request handling. Requires MIDDLEWARE setting (django >= 1.10).
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = _activate(request)
+            try:
+                return await get_response(request)
+            finally:
+                _deactivate(token)
+    else:
+        def middleware(request):
+            token = _activate(request)
+            try:
+                return get_response(request)
+            finally:
+                _deactivate(token)
+
+    return middleware
+
+locale_middleware.sync_capable = True
+locale_middleware.async_capable = True
+
+
+def _report_stats(request, response, stats):
+    request.tranz_stats = stats
+    if settings.TRANZ_INSTRUMENTATION_HEADER:
+        response[settings.TRANZ_INSTRUMENTATION_HEADER] = str(stats)
+    logger.debug("%s %s: %s", request.method, request.path, stats)
+    signals.translation_stats_collected.send(sender=None, request=request, response=response, stats=stats)
+
+
+class TranslationStatsMiddleware(BaseClass):
+    """
+    Counts and times translations done while handling a request (see settings.TRANZ_INSTRUMENTATION).
+    Statistics are stored in request.tranz_stats, sent in a response header
+    (settings.TRANZ_INSTRUMENTATION_HEADER), logged by the "django_translate.instrumentation"
+    logger at DEBUG level and passed to signals.translation_stats_collected receivers.
+    """
+    def process_request(self, request):
+        request._tranz_stats_token = instrumentation.start()
+
+    def process_response(self, request, response):
+        token = getattr(request, '_tranz_stats_token', None)
+        if token is not None:
+            request._tranz_stats_token = None
+            try:
+                stats = instrumentation.stop(token)
+            except (ValueError, RuntimeError):
+                # Token was created in a different context
+                return response
+            _report_stats(request, response, stats)
+        return response
+
+
+def translation_stats_middleware(get_response):
+    """
+    Same as TranslationStatsMiddleware, but supports both WSGI and ASGI (native async)
+    request handling. Requires MIDDLEWARE setting (django >= 1.10).
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = instrumentation.start()
+            try:
+                response = await get_response(request)
+            finally:
+                stats = instrumentation.stop(token)
+            _report_stats(request, response, stats)
+            return response
+    else:
+        def middleware(request):
+            token = instrumentation.start()
+            try:
+                response = get_response(request)
+            finally:
+                stats = instrumentation.stop(token)
+            _report_stats(request, response, stats)
+            return response
+
+    return middleware
+
+translation_stats_middleware.sync_capable = True
+translation_stats_middleware.async_capable = True
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+Automatic reloading of translation files, see settings.TRANZ_AUTO_RELOAD
+
+A background thread waits for changes in directories holding translation files - using
+inotify on linux, or by checking them every TRANZ_AUTO_RELOAD_INTERVAL seconds elsewhere.
+Files of these directories whose modification time, size or inode changed are reported
+to the translator (ReloadingMixin.reload_locales()), which parses only their domains again and
+swaps rebuilt catalogues in at once.
+"""
+
+import os
+import time
+import select
+import struct
+import logging
+import threading
+from collections import defaultdict
+
+from django_translate.translations import get_file_stamp
+from django_translate.snapshots import SNAPSHOT_FORMAT
+
+logger = logging.getLogger(__name__)
+
+# inotify(7)
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+
+INOTIFY_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | \
+               IN_DELETE_SELF | IN_MOVE_SELF
+INOTIFY_EVENT = struct.Struct("iIII")
+
+# Time given to an editor to finish saving a file before it's read
+SETTLE_TIME = 0.05
+
+
+class PollingWatcher(object):
+    """
+    Reports every watched directory as possibly changed once per interval
+    """
+
+    def __init__(self, directories, interval):
+        self.directories = set(directories)
+        self.interval = interval
+
+    def wait(self, timeout=None):
+        """
+        @rtype: set
+        @return: Directories which may have changed
+        """
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+        return set(self.directories)
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(object):
+    """
+    Reports directories in which a file was written, moved, created, deleted or had its
+    attributes changed. Linux only, constructor raises OSError when inotify is not available.
+    """
+
+    def __init__(self, directories):
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self.directories = set(directories)
+        self._watches = {}
+        for directory in self.directories:
+            wd = libc.inotify_add_watch(self._fd, os.fsencode(directory), INOTIFY_MASK)
+            if wd >= 0:
+                self._watches[wd] = directory
+
+    def wait(self, timeout=None):
+        """
+        @rtype: set
+        @return: Directories in which something has changed, empty if nothing happened until timeout
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        # Saving a file often takes a few events, collect all of them at once
+        time.sleep(SETTLE_TIME)
+        data = b""
+        while True:
+            try:
+                chunk = os.read(self._fd, 65536)
+            except BlockingIOError:
+                break
+            if not chunk:
+                break
+            data += chunk
+
+        changed = set()
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(data):
+            wd, mask, cookie, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                return set(self.directories)
+            if wd in self._watches:
+                changed.add(self._watches[wd])
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+class Reloader(object):
+    """
+    Watches translation files of a translator extended with ReloadingMixin and reloads
+    catalogues of locales whose files have changed.
+    """
+
+    def __init__(self, translator, resources, interval=1, use_inotify=True):
+        """
+        @type resources: list
+        @param resources: Translation files as returned by services.discover_resources(),
+                          a list of (format, path, locale, domain)
+
+        @type interval: float
+        @param interval: How often files are checked when inotify is not used, in seconds
+        """
+        self.translator = translator
+        self.resources = list(resources)
+        self.interval = interval
+        self.use_inotify = use_inotify
+        self._thread = None
+        self._watcher = None
+        self._stopped = threading.Event()
+
+        self._files = defaultdict(set)
+        for format, path, locale, domain in self.resources:
+            self._files[os.path.dirname(os.path.abspath(path))].add(path)
+        self._stamps = {path: get_file_stamp(path) for _, path, _, _ in self.resources}
+
+    def check(self, directories=None):
+        """
+        Reloads locales whose files have changed since they were last checked
+
+        @type directories: set
+        @param directories: Check only files in these directories
+
+        @rtype: list
+        @return: Paths of changed files
+        """
+        if directories is None:
+            directories = list(self._files.keys())
+
+        changed = []
+        for directory in directories:
+            for path in self._files.get(directory, ()):
+                stamp = get_file_stamp(path)
+                if stamp != self._stamps[path]:
+                    self._stamps[path] = stamp
+                    changed.append(path)
+
+        if changed:
+            self.reload(changed)
+        return changed
+
+    def reload(self, paths):
+        """
+        Reloads all locales using any of given files
+        """
+        paths = set(paths)
+        locales = set(locale for _, path, locale, _ in self.resources if path in paths)
+
+        for locale in locales:
+            # A precompiled snapshot does not contain the change, use source files from now on
+            if any(resource[0] == SNAPSHOT_FORMAT for resource in self.translator.resources.get(locale, [])):
+                self.translator.resources[locale] = [
+                    [format, path, domain] for format, path, l, domain in self.resources if l == locale
+                ]
+
+        try:
+            reloaded = self.translator.reload_locales(sorted(locales))
+        except Exception:
+            # Most likely a file which is still being written, or has a syntax error.
+            # Previous messages stay in use until the file is fixed
+            logger.exception("Failed to reload translations of %s", ", ".join(sorted(locales)))
+            for path in paths:
+                self._stamps[path] = None
+            return
+
+        if reloaded:
+            logger.info("Reloaded translations of %s", ", ".join(reloaded))
+
+    def start(self):
+        """
+        Starts watching files in a daemon thread
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        directories = list(self._files.keys())
+        self._watcher = None
+        if self.use_inotify:
+            try:
+                self._watcher = InotifyWatcher(directories)
+            except OSError:
+                pass
+        if self._watcher is None:
+            self._watcher = PollingWatcher(directories, self.interval)
+
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="django_translate reloader")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def restart_after_fork(self):
+        """
+        Threads do not survive fork(), a new one has to be started in child processes
+        (e.g. of servers which import the application before forking workers)
+        """
+        self.translator.reset_after_fork()
+        if self._thread is not None:
+            # The inotify descriptor was inherited from the parent, this process needs its own one
+            self._watcher.close()
+            self._thread = None
+            self.start()
+
+    def _run(self):
+        watcher = self._watcher
+        try:
+            while not self._stopped.is_set():
+                directories = watcher.wait(timeout=self.interval)
+                if directories and not self._stopped.is_set():
+                    self.check(directories)
+        finally:
+            watcher.close()
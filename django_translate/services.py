@@ -12,9 +12,32 @@ from python_translate import loaders
 from python_translate import translations
 
 from django_translate import settings
+from django_translate import discovery
+from django_translate import snapshots
+from django_translate import reloading
+from django_translate import freezing
+from django_translate import instrumentation
+from django_translate import usage
+from django_translate import compact
+from django_translate.translations import extend_translator_class, ContextLocaleMixin, LazyLoadingMixin, \
+    CompiledFormatMixin, CompiledPluralMixin, ReloadingMixin, FallbackIndexMixin, ResultCacheMixin, ResultCache
+
+
+def get_discovery_options():
+    """
+    @rtype: tuple
+    @return: Paths to scan, languages to look for in LC_MESSAGES directories
+             and whether to look for LC_MESSAGES directories at all
+    """
+    locale_discovery_paths = list(settings.TRANZ_LOCALE_PATHS)
+    if settings.TRANZ_SEARCH_LOCALE_IN_APPS:
+        locale_discovery_paths += [os.path.join(app.path, settings.TRANZ_DIR_NAME) for app in list(apps.app_configs.values())]
+
+    APP_LANGUAGES = [l[0] for l in settings.TRANZ_LANGUAGES]
+    return locale_discovery_paths, APP_LANGUAGES, bool(settings.TRANZ_REPLACE_DJANGO_TRANSLATIONS)
 
 
-def discover_resources():
+def discover_resources(use_manifest=True):
     """
     Searches for translations files matching [catalog].[lang].[format]
 
@@ -31,52 +54,84 @@ def discover_resources():
      +- messages.fr.yml
       | messages.en.yml
 
+    If TRANZ_DISCOVERY_MANIFEST is set, results are reused for as long as none
+    of the scanned directories changes
+
+    @type use_manifest: bool
+    @param use_manifest: False to scan directories even if the manifest is up to date
+
     @rtype: list
     @return: A list of all found translation files
     """
-    locale_discovery_paths = list(settings.TRANZ_LOCALE_PATHS)
-    if settings.TRANZ_SEARCH_LOCALE_IN_APPS:
-        locale_discovery_paths += [os.path.join(app.path, settings.TRANZ_DIR_NAME) for app in list(apps.app_configs.values())]
-        
-    APP_LANGUAGES = [l[0] for l in settings.TRANZ_LANGUAGES]
-
-    resources = []
-    for path in locale_discovery_paths:
-        if not os.path.isdir(path):
-            continue
-
-        # Try to match direct children or discovery paths
-        for file in os.listdir(path):
-            if os.path.isfile(os.path.join(path, file)):
-                try:
-                    domain, lang, format = file.split('.')
-                except ValueError as e:
-                    continue
-                resources.append((format, os.path.join(path, file), lang, domain))
-        
-        
-        # Try to match django's LC_MESSAGES directories
-        if settings.TRANZ_REPLACE_DJANGO_TRANSLATIONS:
-            for lang in APP_LANGUAGES:
-                if os.path.isdir(os.path.join(path, lang)):
-                    LC_MESSAGES_PATH = os.path.join(path, lang, 'LC_MESSAGES')
-                    if os.path.isdir(LC_MESSAGES_PATH):
-                        for file in os.listdir(LC_MESSAGES_PATH):
-                            try:
-                                domain, format = file.split('.')
-                            except ValueError as e:
-                                continue
-                            resources.append((format, os.path.join(LC_MESSAGES_PATH, file), lang, domain))
+    discovery_options = get_discovery_options()
+
+    manifest_path = settings.TRANZ_DISCOVERY_MANIFEST
+    manifest_key = list(discovery_options)
+    if manifest_path and use_manifest:
+        resources = discovery.read_manifest(manifest_path, manifest_key)
+        if resources is not None:
+            return resources
+
+    resources, directories = discovery.scan(*discovery_options)
+    if manifest_path:
+        discovery.write_manifest(manifest_path, manifest_key, resources, directories)
     return resources
 
 
-translator = settings.TRANZ_TRANSLATOR_CLASS(settings.TRANZ_DEFAULT_LANGUAGE)
+translator_mixins = [ContextLocaleMixin]
+if settings.TRANZ_INSTRUMENTATION:
+    translator_mixins.insert(0, instrumentation.InstrumentedMixin)
+if settings.TRANZ_USAGE_DIR:
+    translator_mixins.insert(0, usage.UsageRecordingMixin)
+# DebugTranslator reloads catalogues and raises errors in trans(), it must not be bypassed
+use_debug_translator = issubclass(settings.TRANZ_TRANSLATOR_CLASS, translations.DebugTranslator)
+if settings.TRANZ_RESULT_CACHE_SIZE and not use_debug_translator:
+    translator_mixins.append(ResultCacheMixin)
+if settings.TRANZ_FALLBACK_INDEX and not use_debug_translator:
+    translator_mixins.append(FallbackIndexMixin)
+if settings.TRANZ_COMPACT_CATALOGUES:
+    translator_mixins.append(compact.CompactCatalogueMixin)
+if settings.TRANZ_LAZY_LOADING:
+    translator_mixins.append(LazyLoadingMixin)
+if settings.TRANZ_COMPILE_MESSAGES:
+    translator_mixins.extend([CompiledPluralMixin, CompiledFormatMixin])
+if settings.TRANZ_AUTO_RELOAD:
+    translator_mixins.append(ReloadingMixin)
+
+translator_class = extend_translator_class(settings.TRANZ_TRANSLATOR_CLASS, translator_mixins)
+translator = translator_class(settings.TRANZ_DEFAULT_LANGUAGE)
+if settings.TRANZ_USAGE_DIR:
+    translator.usage_recorder = usage.UsageRecorder(
+        settings.TRANZ_USAGE_DIR, settings.TRANZ_USAGE_FLUSH_INTERVAL, settings.TRANZ_USAGE_MAX_KEYS)
+    usage.start_recorder(translator.usage_recorder)
+if ResultCacheMixin in translator_mixins:
+    translator.result_cache = ResultCache(settings.TRANZ_RESULT_CACHE_SIZE, settings.TRANZ_RESULT_CACHE_BYTES)
+
 for format, loader in list(settings.TRANZ_LOADERS.items()):
     translator.add_loader(format, loader)
 
-for format, path, locale, domain in discover_resources():
+discovered_resources = resources = discover_resources()
+if settings.TRANZ_SNAPSHOT_DIR:
+    translator.add_loader(snapshots.SNAPSHOT_FORMAT, snapshots.SnapshotLoader())
+    resources = snapshots.use_snapshots(resources, settings.TRANZ_SNAPSHOT_DIR)
+
+for format, path, locale, domain in resources:
     translator.add_resource(format, path, locale, domain)
 
+if settings.TRANZ_FREEZE_CATALOGUES:
+    freezing.freeze(translator)
+    if settings.TRANZ_AUTO_RELOAD:
+        translator.prepare_catalogue = freezing.freeze_catalogue
+
+reloader = None
+if settings.TRANZ_AUTO_RELOAD:
+    reloader = reloading.Reloader(translator, discovered_resources, settings.TRANZ_AUTO_RELOAD_INTERVAL)
+    reloader.start()
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=reloader.restart_after_fork)
+elif hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=translator.reset_after_fork)
+
 _ = translator.trans
 trans = tranz = translator.trans
 transchoice = tranzchoice = translator.transchoice
@@ -96,49 +151,91 @@ for format, subextractor in list(settings.TRANZ_EXTRACTORS.items()):
 def monkeypatch_django():
     from django.utils import translation
     from django.utils.translation import trans_real
+    from django_translate.lazy import LazyTranslation, LazyPluralTranslation
     
+    # {DjangoTranslation: locale}, DjangoTranslation objects are created once per language and never dropped
+    active_locales = {}
+
     def get_locale():
-        if trans_real._active and hasattr(trans_real._active, "value"):
-            return trans_real._active.value.language()
-        
+        active = getattr(trans_real._active, "value", None)
+        if active is not None:
+            try:
+                return active_locales[active]
+            except KeyError:
+                locale = active_locales[active] = active.language()
+                return locale
+
         if trans_real._default and hasattr(trans_real._default, "_DjangoTranslation__locale"):
             return trans_real._default._DjangoTranslation__locale
         
         return settings.TRANZ_DEFAULT_LANGUAGE
-    
+
+    # DebugTranslator reloads catalogues in trans(), they must not be bypassed
+    use_flattened_domain = not isinstance(translator, translations.DebugTranslator)
+
+    def translate_into(locale, message):
+        if use_flattened_domain:
+            # Frozen messages are shared by processes, they have no private flattened copy
+            messages = translator.get_flattened_domain('django', locale)
+            text = messages.get(message) if messages is not None else None
+            if text is not None:
+                return text
+        return trans(message, domain='django', locale=locale)
+
     def gettext_patch(message):
-        return trans(message, domain='django', locale=get_locale())
+        return translate_into(get_locale(), message)
     
     def contextual_gettext_patch(context, message):
         return gettext_patch(message)
         
     def plural_gettext_patch(singular, plural, n):
-        return transchoice(plural, n, domain='django', locale=get_locale())
+        return translate_plural_into(get_locale(), singular, plural, n)
 
     def contextual_plural_gettext_patch(context, singular, plural, n):
         return plural_gettext_patch(singular, plural, n)
+
+    def translate_plural_into(locale, singular, plural, n):
+        return transchoice(plural, n, domain='django', locale=locale)
+
+    if settings.TRANZ_INSTRUMENTATION:
+        translate_into = instrumentation.instrument_gettext(translator, translate_into)
+        translate_plural_into = instrumentation.instrument("gettext", translate_plural_into)
+    if settings.TRANZ_USAGE_DIR:
+        translate_into = usage.record_gettext(translator.usage_recorder, translate_into)
+
+    def gettext_lazy_patch(message):
+        return LazyTranslation(translator, get_locale, translate_into, message)
+
+    def contextual_gettext_lazy_patch(context, message):
+        return gettext_lazy_patch(message)
+
+    def plural_gettext_lazy_patch(singular, plural, number=None):
+        return LazyPluralTranslation(translator, get_locale, translate_plural_into, singular, plural, number)
+
+    def contextual_plural_gettext_lazy_patch(context, singular, plural, number=None):
+        return plural_gettext_lazy_patch(singular, plural, number)
     
     setattr(translation, "gettext", gettext_patch)
     setattr(translation, "ngettext", gettext_patch)
     setattr(translation, "ugettext", gettext_patch)
-    setattr(translation, "gettext_lazy", gettext_patch)
-    setattr(translation, "ugettext_lazy", gettext_patch)
+    setattr(translation, "gettext_lazy", gettext_lazy_patch)
+    setattr(translation, "ugettext_lazy", gettext_lazy_patch)
     
     setattr(translation, "pgettext", contextual_gettext_patch)
-    setattr(translation, "pgettext_lazy", contextual_gettext_patch)
+    setattr(translation, "pgettext_lazy", contextual_gettext_lazy_patch)
     
     setattr(translation, "ngettext", plural_gettext_patch)
     setattr(translation, "ungettext", plural_gettext_patch)
-    setattr(translation, "ngettext_lazy", plural_gettext_patch)
-    setattr(translation, "ungettext_lazy", plural_gettext_patch)
+    setattr(translation, "ngettext_lazy", plural_gettext_lazy_patch)
+    setattr(translation, "ungettext_lazy", plural_gettext_lazy_patch)
     setattr(translation, "do_ntranslate", lambda _1, _2, _3, _4: plural_gettext_patch(_1, _2, _3))
     
     setattr(translation, "npgettext", contextual_plural_gettext_patch)
-    setattr(translation, "npgettext_lazy", contextual_plural_gettext_patch)
+    setattr(translation, "npgettext_lazy", contextual_plural_gettext_lazy_patch)
     
     from django.template import base as base_template
-    setattr(base_template, "ugettext_lazy", gettext_patch)
-    setattr(base_template, "pgettext_lazy", contextual_gettext_patch)
+    setattr(base_template, "ugettext_lazy", gettext_lazy_patch)
+    setattr(base_template, "pgettext_lazy", contextual_gettext_lazy_patch)
     
     from django.template import defaultfilters
     setattr(defaultfilters, "ugettext", gettext_patch)
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import os
 from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
 import python_translate.extractors as extractors
 import python_translate.extractors.base
 import python_translate.extractors.python
@@ -28,6 +29,34 @@ TRANZ_LOADERS = _d('TRANZ_LOADERS', lambda: {
     "yml": loaders.YamlFileLoader()
 })
 
+TRANZ_LAZY_LOADING = _d('TRANZ_LAZY_LOADING', lambda: False)
+
+TRANZ_COMPILE_MESSAGES = _d('TRANZ_COMPILE_MESSAGES', lambda: True)
+
+TRANZ_FALLBACK_INDEX = _d('TRANZ_FALLBACK_INDEX', lambda: True)
+
+TRANZ_COMPACT_CATALOGUES = _d('TRANZ_COMPACT_CATALOGUES', lambda: False)
+
+TRANZ_RESULT_CACHE_SIZE = _d('TRANZ_RESULT_CACHE_SIZE', lambda: 0)
+TRANZ_RESULT_CACHE_BYTES = _d('TRANZ_RESULT_CACHE_BYTES', lambda: None)
+
+TRANZ_FRAGMENT_CACHE = _d('TRANZ_FRAGMENT_CACHE', lambda: 'default')
+TRANZ_FRAGMENT_CACHE_TIMEOUT = _d('TRANZ_FRAGMENT_CACHE_TIMEOUT', lambda: DEFAULT_TIMEOUT)
+
+TRANZ_SNAPSHOT_DIR = _d('TRANZ_SNAPSHOT_DIR', lambda: None)
+
+TRANZ_AUTO_RELOAD = _d('TRANZ_AUTO_RELOAD', lambda: False)
+TRANZ_AUTO_RELOAD_INTERVAL = _d('TRANZ_AUTO_RELOAD_INTERVAL', lambda: 1)
+
+TRANZ_FREEZE_CATALOGUES = _d('TRANZ_FREEZE_CATALOGUES', lambda: False)
+
+TRANZ_INSTRUMENTATION = _d('TRANZ_INSTRUMENTATION', lambda: False)
+TRANZ_INSTRUMENTATION_HEADER = _d('TRANZ_INSTRUMENTATION_HEADER', lambda: 'X-Tranz-Stats')
+
+TRANZ_USAGE_DIR = _d('TRANZ_USAGE_DIR', lambda: None)
+TRANZ_USAGE_FLUSH_INTERVAL = _d('TRANZ_USAGE_FLUSH_INTERVAL', lambda: 60)
+TRANZ_USAGE_MAX_KEYS = _d('TRANZ_USAGE_MAX_KEYS', lambda: 1000000)
+
 TRANZ_DUMPERS = _d('TRANZ_DUMPERS', lambda: {
     "json": dumpers.JSONFileDumper(),
 })
@@ -53,6 +82,8 @@ TRANZ_DIR_NAME = _d('TRANZ_DIR_NAME', lambda: 'tranz')
 
 TRANZ_LOCALE_PATHS = _d('TRANZ_LOCALE_PATHS', lambda: [])
 
+TRANZ_DISCOVERY_MANIFEST = _d('TRANZ_DISCOVERY_MANIFEST', lambda: None)
+
 if not isinstance(TRANZ_LOCALE_PATHS, (tuple, list)):
     raise ValueError("TRANZ_LOCALE_PATHS must be a tuple or a list")
 
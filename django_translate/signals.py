@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+
+from django.dispatch import Signal
+
+# Sent by middleware.TranslationStatsMiddleware once a response is ready, with arguments
+# request, response and stats - an instrumentation.TranslationStats (see settings.TRANZ_INSTRUMENTATION)
+translation_stats_collected = Signal()
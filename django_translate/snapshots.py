@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Precompiled catalogue snapshots, see the tranzcompile command and settings.TRANZ_SNAPSHOT_DIR
+
+A snapshot holds every message of a single locale. Each domain is stored as a separate
+marshal blob, so a domain may be loaded without reading the rest of the file:
+
+    MAGIC | header length | header | domain blob | domain blob | ...
+
+The header remembers the path, mtime and size of every source file, the snapshot
+is used only as long as all of them are unchanged.
+"""
+
+import os
+import sys
+import mmap
+import struct
+import marshal
+from collections import OrderedDict
+
+from python_translate.loaders import Loader, NotFoundResourceException, InvalidResourceException
+from python_translate.translations import MessageCatalogue
+from python_translate.utils import CaseInsensitiveDict
+
+from django_translate.translations import merge_catalogue, get_file_stamp
+
+SNAPSHOT_FORMAT = "tranzsnapshot"
+
+MAGIC = b"TRANZSNAPSHOT\x01"
+HEADER_LENGTH = struct.Struct("<Q")
+
+
+def get_snapshot_path(directory, locale):
+    return os.path.join(directory, "{0}.{1}".format(locale, SNAPSHOT_FORMAT))
+
+
+def stat_sources(resources):
+    """
+    @type resources: list
+    @param resources: A list of (format, path, domain)
+
+    @rtype: list
+    @return: A list of (format, path, domain, mtime, size), None if any of the files is missing
+    """
+    sources = []
+    for format, path, domain in resources:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        sources.append((format, path, domain, stat.st_mtime, stat.st_size))
+    return sources
+
+
+def write_snapshot(path, locale, resources, loaders):
+    """
+    Parses given resources and stores all their messages in a snapshot file
+
+    @type resources: list
+    @param resources: A list of (format, path, domain) in the same order they are added to translator
+
+    @type loaders: dict
+    @param loaders: Loader instances indexed by format
+
+    @rtype: dict
+    @return: Number of messages written per domain
+    """
+    # Stat files before reading them - if any of them changes in the meantime,
+    # the snapshot will be considered stale instead of silently serving old messages
+    sources = stat_sources(resources)
+    if sources is None:
+        raise NotFoundResourceException("Some of translation files for locale {0} do not exist".format(locale))
+
+    catalogue = MessageCatalogue(locale)
+    for format, resource, domain in resources:
+        if format not in loaders:
+            raise RuntimeError('The "{0}" translation loader is not registered'.format(format))
+        merge_catalogue(catalogue, loaders[format].load(resource, locale, domain))
+
+    blobs = OrderedDict(
+        (domain, marshal.dumps(messages._store)) for domain, messages in sorted(catalogue.messages.items())
+    )
+    domains = {}
+    offset = 0
+    for domain, blob in list(blobs.items()):
+        domains[domain] = (offset, len(blob))
+        offset += len(blob)
+
+    header = marshal.dumps({
+        "python": tuple(sys.version_info[:2]),
+        "locale": locale,
+        "sources": sources,
+        "domains": domains,
+    })
+
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    tmp_path = "{0}.{1}.tmp".format(path, os.getpid())
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(HEADER_LENGTH.pack(len(header)))
+        f.write(header)
+        for blob in list(blobs.values()):
+            f.write(blob)
+    os.replace(tmp_path, path)
+
+    return {domain: len(messages) for domain, messages in list(catalogue.messages.items())}
+
+
+def read_header(path):
+    """
+    @rtype: dict
+    @return: Snapshot header or None if the file does not exist or is not a valid snapshot
+    """
+    try:
+        with open(path, "rb") as f:
+            return _read_header(f)
+    except (IOError, OSError):
+        return None
+
+
+def _read_header(f):
+    try:
+        if f.read(len(MAGIC)) != MAGIC:
+            return None
+        length, = HEADER_LENGTH.unpack(f.read(HEADER_LENGTH.size))
+        header = marshal.loads(f.read(length))
+    except (ValueError, EOFError, TypeError, struct.error):
+        return None
+
+    # marshal format is specific to python version
+    if header.get("python") != tuple(sys.version_info[:2]):
+        return None
+
+    header["data_offset"] = len(MAGIC) + HEADER_LENGTH.size + length
+    return header
+
+
+def is_fresh(header, resources):
+    """
+    Checks whether a snapshot was compiled from exactly these, unchanged, resources
+
+    @type resources: list
+    @param resources: A list of (format, path, domain)
+
+    @rtype: bool
+    """
+    sources = stat_sources(resources)
+    return sources is not None and [tuple(s) for s in header["sources"]] == sources
+
+
+def use_snapshots(resources, directory):
+    """
+    Replaces discovered resources of every locale with a snapshot of this locale,
+    as long as the snapshot is fresh. Locales with a stale or missing snapshot
+    are loaded from source files.
+
+    @type resources: list
+    @param resources: A list of (format, path, locale, domain) as returned by discover_resources()
+
+    @rtype: list
+    @return: A list of (format, path, locale, domain)
+    """
+    by_locale = OrderedDict()
+    for format, path, locale, domain in resources:
+        by_locale.setdefault(locale, []).append((format, path, domain))
+
+    result = []
+    for locale, locale_resources in list(by_locale.items()):
+        snapshot_path = get_snapshot_path(directory, locale)
+        header = read_header(snapshot_path)
+        if header is not None and header["locale"] == locale and is_fresh(header, locale_resources):
+            result += [(SNAPSHOT_FORMAT, snapshot_path, locale, domain) for domain in sorted(header["domains"])]
+        else:
+            result += [(format, path, locale, domain) for format, path, domain in locale_resources]
+    return result
+
+
+class SnapshotLoader(Loader):
+    """
+    Loads a single domain from a snapshot written by write_snapshot()
+
+    Every snapshot is opened and its header parsed only once, and then memory mapped until
+    the file changes, so loading all domains of a locale does not read the header again and again.
+    """
+
+    def __init__(self):
+        # {path: (stamp, header, memory map)}
+        self._snapshots = {}
+
+    def open_snapshot(self, path):
+        """
+        @rtype: tuple
+        @return: Header and a memory map of the snapshot, (None, None) if it does not exist or is not valid
+        """
+        stamp = get_file_stamp(path)
+        cached = self._snapshots.get(path)
+        if cached is not None and stamp is not None and cached[0] == stamp:
+            return cached[1], cached[2]
+
+        try:
+            with open(path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (IOError, OSError, ValueError):
+            return None, None
+
+        header = _read_header(data)
+        if header is None:
+            data.close()
+            return None, None
+
+        self._snapshots[path] = (stamp, header, data)
+        return header, data
+
+    def load(self, resource, locale, domain='messages'):
+        header, data = self.open_snapshot(resource)
+        if header is None:
+            raise NotFoundResourceException('File "{0}" is not a valid snapshot'.format(resource))
+
+        catalogue = MessageCatalogue(locale)
+        if domain in header["domains"]:
+            offset, length = header["domains"][domain]
+            start = header["data_offset"] + offset
+            try:
+                messages = CaseInsensitiveDict()
+                messages._store = marshal.loads(data[start:start + length])
+            except (ValueError, EOFError, TypeError):
+                raise InvalidResourceException('Snapshot "{0}" is corrupted'.format(resource))
+            catalogue.messages[domain] = messages
+        catalogue.add_resource(resource)
+
+        return catalogue
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Template loader translating constant {% tranz %} tags in advance
+
+Wraps other loaders the same way as django.template.loaders.cached.Loader, but keeps a separate
+copy of every template for each locale it's requested in. Constant tags of each copy (literal id,
+domain, parameters and number) are replaced with their translations, so rendering them costs
+almost nothing. All copies are dropped whenever translation files change.
+
+    TEMPLATES = [{
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'OPTIONS': {
+            'loaders': [
+                ('django_translate.template_loaders.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
+        },
+    }]
+"""
+
+from django.template.loaders import base, cached
+
+from django_translate.services import translator
+from django_translate.templatetags.tranz import pretranslate
+
+
+class _PretranslatingLoader(base.Loader):
+    """
+    Comes right after cached.Loader in Loader's MRO: templates are pretranslated as soon as
+    they are loaded, before they are cached and shared by threads, so they never change afterwards
+    """
+
+    def get_template(self, template_name, *args, **kwargs):
+        template = super(_PretranslatingLoader, self).get_template(template_name, *args, **kwargs)
+        pretranslate(template.nodelist, translator.locale)
+        return template
+
+
+class Loader(cached.Loader, _PretranslatingLoader):
+
+    def __init__(self, engine, loaders):
+        self.fingerprint = None
+        super(Loader, self).__init__(engine, loaders)
+
+    def get_template(self, template_name, *args, **kwargs):
+        fingerprint = translator.get_catalogues_fingerprint()
+        if fingerprint != self.fingerprint:
+            self.reset()
+            self.fingerprint = fingerprint
+        return super(Loader, self).get_template(template_name, *args, **kwargs)
+
+    def cache_key(self, template_name, *args, **kwargs):
+        # Every locale gets its own copy of the template
+        return "{0}-{1}".format(super(Loader, self).cache_key(template_name, *args, **kwargs), translator.locale)
@@ -3,14 +3,20 @@
 
 import re
 import json
+import hashlib
 from functools import partial
 from django import template
-from django.core.urlresolvers import reverse as _reverse
-from django.template import Library, Node, TemplateSyntaxError
-from django.template.base import VariableDoesNotExist
+from django.core.cache import caches
+try:
+    from django.urls import reverse as _reverse
+except ImportError:
+    from django.core.urlresolvers import reverse as _reverse
+from django.template import Library, Node, NodeList, TemplateSyntaxError
+from django.template.base import TextNode, VariableDoesNotExist
 from django.template.loader import render_to_string
 from django_translate.services import translator
 from django_translate import settings
+from django_translate import instrumentation
 
 register = Library()
 
@@ -66,6 +72,22 @@ register.tag("tranz", tranz)
 register.tag("tranzchoice", partial(tranz, is_transchoice=True))
 
 
+def _literal(variable):
+    """
+    Returns the value of a Variable if it's a literal (does not depend on the context)
+
+    :param variable: template.Variable or None
+    :return: literal value, None if variable is None, DYNAMIC otherwise
+    """
+    if variable is None:
+        return None
+    if variable.lookups is not None or variable.translate:
+        return DYNAMIC
+    return variable.literal
+
+DYNAMIC = object()
+
+
 class TranzNode(Node):
 
     def __init__(self, id, parameters, domain, locale, number=None, is_transchoice=False):
@@ -73,41 +95,63 @@ class TranzNode(Node):
         self.parameters = {
             k: template.Variable(v) for k, v in list(parameters.items())
         }
-        self.domain = domain
-        self.locale = locale
+        self.domain = template.Variable(domain) if domain is not None else None
+        self.locale = template.Variable(locale) if locale is not None else None
         self.is_transchoice = is_transchoice
-        self.number = number if is_transchoice else None
+        self.number = template.Variable(number) if is_transchoice and number is not None else None
         super(TranzNode, self).__init__()
 
+        # Everything that does not depend on the context is resolved once, while the template is parsed
+        self.id_value = _literal(self.id)
+        self.domain_value = _literal(self.domain)
+        self.locale_value = _literal(self.locale)
+        self.number_value = _literal(self.number)
+        self.parameter_values = {}
+        self.dynamic_parameters = []
+        for k, v in list(self.parameters.items()):
+            value = _literal(v)
+            if value is DYNAMIC:
+                self.dynamic_parameters.append((k, v))
+            else:
+                self.parameter_values[k] = value
+
+        self.is_constant = not self.dynamic_parameters and DYNAMIC not in (
+            self.id_value, self.domain_value, self.locale_value, self.number_value)
+
     def render(self, context):
+        if self.is_constant:
+            id = self.id_value
+            parameters = dict(self.parameter_values)
+            domain = self.domain_value
+            locale = self.locale_value
+            number = self.number_value
+        else:
+            id = self.id_value if self.id_value is not DYNAMIC else self.id.resolve(context)
+
+            parameters = dict(self.parameter_values)
+            for k, v in self.dynamic_parameters:
+                try:
+                    parameters[k] = v.resolve(context)
+                except VariableDoesNotExist as e:
+                    parameters[k] = ""
+
+            domain = self.domain_value if self.domain_value is not DYNAMIC else self.domain.resolve(context)
+            locale = self.locale_value if self.locale_value is not DYNAMIC else self.locale.resolve(context)
+            number = self.number_value if self.number_value is not DYNAMIC else self.number.resolve(context)
+
         prefix = context.get("tranz_prefix", "")
         if prefix:
-            prefix += "_"
-        id = prefix + self.id.resolve(context)
+            id = prefix + "_" + id
 
-        parameters = {}
-        for k, v in list(self.parameters.items()):
-            try:
-                parameters[k] = v.resolve(context)
-            except VariableDoesNotExist as e:
-                parameters[k] = ""
+        if self.domain is None:
+            domain = context.get('tranz_domain', None)
 
-        domain = template.Variable(self.domain).resolve(context) if self.domain is not None \
-                        else context.get('tranz_domain', None)
-        locale = template.Variable(self.locale).resolve(context) if self.locale is not None \
-                        else context.get('tranz_locale', None)
-        number = template.Variable(self.number).resolve(context) if self.number is not None else None
+        if self.locale is None:
+            locale = context.get('tranz_locale', None)
 
         if locale is None:
-            # Try to use LocaleMiddleware if it's on
-
-            is_request_context = isinstance(context, template.RequestContext)
-            if is_request_context and hasattr(context, "request") and hasattr(context.request, 'LANGUAGE_CODE'):
-                locale = context.request.LANGUAGE_CODE
+            locale = _get_default_locale(context)
 
-        if locale is None:
-            locale = settings.TRANZ_DEFAULT_LANGUAGE
-            
         if self.is_transchoice:
             return translator.transchoice(
                 id,
@@ -119,6 +163,133 @@ class TranzNode(Node):
         else:
             return translator.trans(id, parameters, domain, locale)
 
+if settings.TRANZ_INSTRUMENTATION:
+    TranzNode.render = instrumentation.instrument("template", TranzNode.render)
+
+
+def _get_default_locale(context):
+    """
+    Locale of tags which have neither "into" nor {% tranz_context locale=... %}
+    """
+    # Try to use LocaleMiddleware if it's on
+    request = getattr(context, "request", None)
+    if request is not None:
+        locale = getattr(request, 'LANGUAGE_CODE', None)
+        if locale is not None:
+            return locale
+
+    # Locale activated for current request or TRANZ_DEFAULT_LANGUAGE
+    return translator.locale
+
+
+class PretranslatedNode(Node):
+    """
+    A run of text and constant {% tranz %} or {% tranzchoice %} tags translated in advance, see pretranslate()
+    """
+
+    def __init__(self, nodes, locale, text):
+        """
+        @type nodes: list
+        @param nodes: TextNodes and TranzNodes replaced by this node
+
+        @type locale: str
+        @param locale: Locale tags without "into" were translated into
+
+        @type text: str
+        @param text: Rendered nodes
+        """
+        self.nodes = NodeList(nodes)
+        self.locale = locale
+        self.text = text
+        self.tags = [node for node in nodes if isinstance(node, TranzNode)]
+        self.depends_on_domain = any(node.domain is None for node in self.tags)
+        self.depends_on_locale = any(node.locale is None for node in self.tags)
+        self.token = nodes[0].token
+        self.origin = getattr(nodes[0], "origin", None)
+        super(PretranslatedNode, self).__init__()
+
+    def render(self, context):
+        # {% tranz_context %} or the view may change messages, which then must be looked up
+        if context.get("tranz_prefix", ""):
+            return self.nodes.render(context)
+        if self.depends_on_domain and context.get('tranz_domain', None) is not None:
+            return self.nodes.render(context)
+
+        if self.depends_on_locale:
+            locale = context.get('tranz_locale', None)
+            if locale is None:
+                locale = _get_default_locale(context)
+            if locale != self.locale:
+                return self.nodes.render(context)
+
+        usage_recorder = getattr(translator, "usage_recorder", None)
+        if usage_recorder is not None:
+            for node in self.tags:
+                usage_recorder.record(node.locale_value or self.locale, node.domain_value or 'messages', node.id_value)
+        return self.text
+
+
+def _pretranslate_node(node, locale):
+    """
+    @rtype: str
+    @return: What node renders to in given locale when nothing in the context changes it, None if unknown
+    """
+    if isinstance(node, TextNode):
+        return node.s
+
+    if not isinstance(node, TranzNode) or not node.is_constant:
+        return None
+
+    locale = node.locale_value if node.locale_value is not None else locale
+    try:
+        if node.is_transchoice:
+            return translator.transchoice(node.id_value, node.number_value, dict(node.parameter_values),
+                                          node.domain_value, locale)
+        return translator.trans(node.id_value, dict(node.parameter_values), node.domain_value, locale)
+    except Exception:
+        # Left for render() to raise
+        return None
+
+
+def pretranslate(nodelist, locale):
+    """
+    Replaces every run of text and constant {% tranz %} or {% tranzchoice %} tags (literal id, domain,
+    parameters and number) of a nodelist, and of all nodes it holds, with a single PretranslatedNode
+    holding their translations into given locale.
+
+    @type nodelist: django.template.base.NodeList
+    @type locale: str
+    """
+    nodes = []
+    run = []
+    for node in list(nodelist) + [None]:
+        text = _pretranslate_node(node, locale) if node is not None else None
+        if text is not None:
+            run.append((node, text))
+            continue
+
+        if any(isinstance(run_node, TranzNode) for run_node, _ in run):
+            nodes.append(PretranslatedNode([run_node for run_node, _ in run], locale,
+                                           "".join(text for _, text in run)))
+        else:
+            nodes.extend(run_node for run_node, _ in run)
+        run = []
+
+        if node is None:
+            break
+        elif hasattr(node, "conditions_nodelists"):
+            # {% if %} builds its nodelist attribute on the fly
+            for _, nested in node.conditions_nodelists:
+                pretranslate(nested, locale)
+        else:
+            for attr in node.child_nodelists:
+                nested = getattr(node, attr, None)
+                if nested:
+                    pretranslate(nested, locale)
+        nodes.append(node)
+
+    nodelist[:] = nodes
+
 
 @register.tag
 def tranz_context(parser, token):
@@ -151,18 +322,86 @@ def tranz_context(parser, token):
 class TranzContextNode(Node):
 
     def __init__(self, prefix, domain, locale):
-        self.prefix = prefix
-        self.domain = domain
-        self.locale = locale
+        self.prefix = template.Variable(prefix) if prefix is not None else None
+        self.domain = template.Variable(domain) if domain is not None else None
+        self.locale = template.Variable(locale) if locale is not None else None
         super(TranzContextNode, self).__init__()
 
     def render(self, context):
         if self.prefix is not None:
-            context['tranz_prefix'] = template.Variable(self.prefix).resolve(context)
+            context['tranz_prefix'] = self.prefix.resolve(context)
 
         if self.domain is not None:
-            context['tranz_domain'] = template.Variable(self.domain).resolve(context)
+            context['tranz_domain'] = self.domain.resolve(context)
 
         if self.locale is not None:
-            context['tranz_locale'] = template.Variable(self.locale).resolve(context)
+            context['tranz_locale'] = self.locale.resolve(context)
         return ""
+
+
+@register.tag
+def tranz_cache(parser, token):
+    """
+    Caches rendered content of the block in settings.TRANZ_FRAGMENT_CACHE:
+
+        {% tranz_cache %}...{% endtranz_cache %}
+        {% tranz_cache name="footer" timeout=3600 user.is_staff %}...{% endtranz_cache %}
+
+    Cached content is kept per locale, {% tranz_context %} prefix and domain, translation files
+    and values of the other (optional) arguments.
+    """
+    tokens = token.split_contents()
+    name = timeout = None
+    vary_on = []
+    for token_part in tokens[1:]:
+        if token_part.startswith("name="):
+            name = parser.compile_filter(token_part[len("name="):])
+        elif token_part.startswith("timeout="):
+            timeout = parser.compile_filter(token_part[len("timeout="):])
+        else:
+            vary_on.append(parser.compile_filter(token_part))
+
+    nodelist = parser.parse(('endtranz_cache',))
+    parser.delete_first_token()
+
+    # Blocks without a name are told apart by their position
+    origin = getattr(parser, "origin", None)
+    position = "{0}:{1}".format(getattr(origin, "name", ""), getattr(token, "lineno", ""))
+    return TranzCacheNode(nodelist, name, timeout, vary_on, position)
+
+
+class TranzCacheNode(Node):
+
+    def __init__(self, nodelist, name, timeout, vary_on, position):
+        self.nodelist = nodelist
+        self.name = name
+        self.timeout = timeout
+        self.vary_on = vary_on
+        self.position = position
+        super(TranzCacheNode, self).__init__()
+
+    def get_cache_key(self, context):
+        locale = context.get('tranz_locale', None)
+        if locale is None:
+            locale = _get_default_locale(context)
+
+        parts = [
+            self.name.resolve(context) if self.name is not None else self.position,
+            locale,
+            context.get('tranz_prefix', ""),
+            context.get('tranz_domain', None),
+            translator.get_catalogues_fingerprint(),
+        ] + [variable.resolve(context) for variable in self.vary_on]
+        return "tranz_cache." + hashlib.md5(json.dumps(parts, default=str).encode("utf-8")).hexdigest()
+
+    def render(self, context):
+        cache = caches[settings.TRANZ_FRAGMENT_CACHE]
+        key = self.get_cache_key(context)
+        content = cache.get(key)
+        if content is None:
+            content = self.nodelist.render(context)
+            if self.timeout is not None:
+                cache.set(key, content, int(self.timeout.resolve(context)))
+            else:
+                cache.set(key, content, settings.TRANZ_FRAGMENT_CACHE_TIMEOUT)
+        return content
@@ -0,0 +1,960 @@
+# -*- coding: utf-8 -*-
+"""
+Extensions of python_translate's Translator used by django_translate.services
+
+Every feature is a mixin which is combined with settings.TRANZ_TRANSLATOR_CLASS
+by extend_translator_class(), so it works the same way with Translator,
+DebugTranslator or any custom translator class.
+"""
+
+import os
+import sys
+import hashlib
+import threading
+from functools import lru_cache
+from collections import defaultdict, OrderedDict
+
+try:
+    from contextvars import ContextVar
+except ImportError:
+    ContextVar = None
+
+from python_translate.translations import MessageCatalogue, DebugTranslator
+from python_translate.utils import CaseInsensitiveDict
+import python_translate.selector as selector
+
+from django_translate.formatting import Interpolator, PluralSelector
+
+# Compiled messages are dropped all at once when there is more of them than this
+MAX_INTERPOLATORS = 100000
+
+# Least recently used plural selectors are dropped when there is more of them than this
+MAX_PLURAL_SELECTORS = 10000
+
+
+def extend_translator_class(translator_class, mixins):
+    """
+    Creates a subclass of translator_class with TranslatorMixin and given mixins applied on top of it
+
+    @type translator_class: type
+    @type mixins: list
+
+    @rtype: type
+    """
+    return type(translator_class.__name__, tuple(mixins) + (TranslatorMixin, translator_class), {})
+
+
+def merge_catalogue(catalogue, other):
+    """
+    Same as catalogue.add_catalogue(other), but domains missing in catalogue are taken over
+    as they are instead of being copied message by message. Do not use other afterwards.
+
+    @type catalogue: MessageCatalogue
+    @type other: MessageCatalogue
+    """
+    if catalogue.locale != other.locale:
+        raise ValueError(
+            'Cannot add a catalogue for locale "%s" as the '
+            'current locale for this catalogue is "%s"' %
+            (other.locale, catalogue.locale))
+
+    for domain, messages in list(other.messages.items()):
+        if domain in catalogue.messages:
+            catalogue.messages[domain].update(messages)
+        else:
+            catalogue.messages[domain] = messages
+
+    for resource in other.resources:
+        catalogue.add_resource(resource)
+
+
+def get_domain_messages(catalogue, domain):
+    """
+    Same as catalogue.all(domain), without copying messages into a new dict
+
+    @type catalogue: MessageCatalogue
+    @type domain: str
+    @rtype: collections.abc.Mapping
+    """
+    if isinstance(catalogue, LazyMessageCatalogue):
+        catalogue.load_domain(domain)
+    return catalogue.messages.get(domain, {})
+
+
+class TranslatorMixin(object):
+    """
+    Splits Translator._do_load_catalogue() into smaller steps that other mixins may override,
+    and notifies them whenever loaded catalogues change (see _catalogues_changed())
+    """
+
+    catalogues_version = 0
+    _stamps_version = 0
+    _fingerprint = None
+
+    def __init__(self, *args, **kwargs):
+        self._fallback_indexes = {}
+        # Held by mixins while they put catalogues into self.catalogues
+        self._catalogue_lock = threading.RLock()
+        # {(format, resource, locale, domain): stamp of the file when it was parsed}
+        self._resource_stamps = {}
+        super(TranslatorMixin, self).__init__(*args, **kwargs)
+
+    def reset_after_fork(self):
+        """
+        Locks held by threads of the parent at the time of the fork stay held forever in the child,
+        they have to be replaced in child processes
+        """
+        self._catalogue_lock = threading.RLock()
+
+    def get_flattened_domain(self, domain, locale):
+        """
+        Returns messages of given domain with fallbacks already resolved and formatted without
+        parameters, as a read-only mapping: for every id it holds,
+        messages.get(id) == trans(id, domain=domain, locale=locale).
+
+        Messages are those of the fallback index (see get_fallback_index()), only the ones
+        which contain braces are formatted and kept aside. Ids missing in it must go through trans().
+
+        @type domain: str
+        @type locale: str
+        @rtype: FlattenedMessages
+        @return: The messages, None if the domain has no fallback index (its messages are frozen)
+        """
+        index = self.get_fallback_index(domain, locale)
+        if index is None:
+            return None
+
+        flattened = index.flattened
+        if flattened is None:
+            formatted = {}
+            for id, message in list(index.messages.items()):
+                if '{' in message or '}' in message:
+                    try:
+                        formatted[id.lower()] = self.format(message, {})
+                    except (ValueError, IndexError, KeyError, AttributeError):
+                        # Leave it to trans(), so that it raises the same error
+                        pass
+            flattened = index.flattened = FlattenedMessages(index.messages, formatted)
+        return flattened
+
+    def get_fallback_index(self, domain, locale):
+        """
+        Returns an index of messages of given domain with fallbacks already resolved, which
+        tells where trans() and transchoice() find each id without walking fallback catalogues.
+        It's built once and rebuilt whenever catalogues change.
+
+        @type domain: str
+        @type locale: str
+        @rtype: FallbackIndex
+        @return: The index, None if messages of the domain are frozen (see django_translate.freezing) - an index
+                 would be a private copy of messages each process shares with others
+        """
+        try:
+            return self._fallback_indexes[(domain, locale)]
+        except KeyError:
+            pass
+
+        version = self.catalogues_version
+        index = self._build_fallback_index(domain, locale)
+        if version == self.catalogues_version:
+            self._fallback_indexes[(domain, locale)] = index
+        return index
+
+    def _build_fallback_index(self, domain, locale):
+        from django_translate.freezing import FrozenMessages
+
+        catalogues = self._get_catalogue_chain(locale)
+        chain = [get_domain_messages(catalogue, domain) for catalogue in catalogues]
+        if any(len(messages) for messages in chain) and \
+                all(isinstance(messages, FrozenMessages) for messages in chain if len(messages)):
+            return None
+
+        index = FallbackIndex(catalogues[-1].locale)
+        for catalogue, messages in reversed(list(zip(catalogues, chain))):
+            store = getattr(messages, "_store", None)
+            if store is not None:
+                # Lowercased ids of CaseInsensitiveDict are shared instead of being created again
+                items = [(lower, message) for lower, (_, message) in list(store.items())]
+            else:
+                items = [(id.lower(), message) for id, message in list(messages.items())]
+
+            index.messages.update(items)
+            if catalogue.locale == locale:
+                for lower, _ in items:
+                    index.locales.pop(lower, None)
+            else:
+                index.locales.update((lower, catalogue.locale) for lower, _ in items)
+        return index
+
+    def _get_catalogue_chain(self, locale):
+        """
+        @rtype: list
+        @return: Catalogue of given locale followed by its fallback catalogues
+        """
+        self._assert_valid_locale(locale)
+
+        catalogues = []
+        catalogue = self.get_catalogue(locale)
+        # Translator links fallbacks of catalogues loaded in some orders into a cycle (e.g. en -> de
+        # and then fr -> de -> en), which must not make this loop forever
+        while catalogue is not None and catalogue not in catalogues:
+            catalogues.append(catalogue)
+            catalogue = catalogue.fallback_catalogue
+        return catalogues
+
+    def trans(self, id, parameters=None, domain=None, locale=None):
+        parameters, domain, locale = self._prepare_arguments(parameters, domain, locale)
+        msg, _ = self._find_message(id, domain, locale)
+        return self.format(msg, parameters)
+
+    def transchoice(self, id, number, parameters=None, domain=None, locale=None):
+        parameters, domain, locale = self._prepare_arguments(parameters, domain, locale)
+        msg, locale = self._find_message(id, domain, locale)
+        parameters['count'] = number
+        return self.format(self.select_plural(msg, number, locale), parameters)
+
+    def _prepare_arguments(self, parameters, domain, locale):
+        """
+        Fills in defaults of trans() and transchoice() arguments, the same way Translator does
+
+        @rtype: tuple
+        @return: parameters, domain, locale
+        @raises: ValueError if the locale is invalid
+        """
+        if parameters is None:
+            parameters = {}
+        assert isinstance(parameters, dict)
+
+        if locale is None:
+            locale = self.locale
+        else:
+            self._assert_valid_locale(locale)
+
+        return parameters, domain or 'messages', locale
+
+    def _find_message(self, id, domain, locale):
+        """
+        Looks a message up in the catalogue of given locale and then in its fallbacks
+
+        @rtype: tuple
+        @return: The message (its id if it's missing everywhere) and the locale it comes from
+        @raises: RuntimeError if the message is missing and the translator is a DebugTranslator
+        """
+        chain = self._get_catalogue_chain(locale)
+        for catalogue in chain:
+            if catalogue.defines(id, domain):
+                return catalogue.get(id, domain), catalogue.locale
+
+        if isinstance(self, DebugTranslator):
+            raise RuntimeError(
+                "There is no translation for {0} in domain {1}".format(
+                    id,
+                    domain
+                )
+            )
+
+        return id, chain[-1].locale
+
+    def select_plural(self, message, number, locale):
+        """
+        @rtype: str
+        @return: Plural form of message used for given number
+        """
+        return selector.select_message(message, number, locale)
+
+    def get_catalogues_fingerprint(self):
+        """
+        Identifies the translation files catalogues are loaded from, as they were when they were parsed.
+        Unlike catalogues_version, it's the same in every process using the same files,
+        so it may be a part of keys of caches shared between processes.
+
+        @rtype: str
+        """
+        version = (self.catalogues_version, self._stamps_version)
+        fingerprint = self._fingerprint
+        if fingerprint is None or fingerprint[0] != version:
+            stamps = self._resource_stamps
+            resources = []
+            for locale, locale_resources in list(self.resources.items()):
+                for format, resource, domain in locale_resources:
+                    stamp = None
+                    if isinstance(resource, str):
+                        # Files which were not parsed yet will be parsed as they are now
+                        key = (format, resource, locale, domain)
+                        stamp = stamps[key] if key in stamps else get_file_stamp(resource)
+                    resources.append((locale, format, str(resource), domain or "", stamp))
+            resources.sort()
+            fingerprint = self._fingerprint = (version, hashlib.sha1(repr(resources).encode("utf-8")).hexdigest())
+        return fingerprint[1]
+
+    def _do_load_catalogue(self, locale):
+        self.catalogues[locale] = self._create_catalogue(locale)
+        self._catalogues_changed()
+
+    def add_resource(self, format, resource, locale, domain=None):
+        super(TranslatorMixin, self).add_resource(format, resource, locale, domain)
+        self._catalogues_changed()
+
+    def set_fallback_locales(self, locales):
+        super(TranslatorMixin, self).set_fallback_locales(locales)
+        self._catalogues_changed()
+
+    def _catalogues_changed(self):
+        """
+        Called whenever a catalogue is (re)loaded or dropped. Mixins caching anything
+        derived from catalogues should extend this method to invalidate their caches.
+        """
+        self.catalogues_version += 1
+        self._fallback_indexes = {}
+
+    def _create_catalogue(self, locale):
+        """
+        Builds a catalogue of all resources registered for given locale (fallbacks are not linked)
+
+        @type locale: str
+        @rtype: MessageCatalogue
+        """
+        catalogue = MessageCatalogue(locale)
+        for format, resource, domain in self.resources.get(locale, []):
+            merge_catalogue(catalogue, self._load_resource(format, resource, locale, domain))
+        return catalogue
+
+    def _load_resource(self, format, resource, locale, domain):
+        """
+        Parses a single resource using a loader registered for given format
+
+        @rtype: MessageCatalogue
+        @raises: RuntimeError if there is no loader for given format
+        """
+        if format not in self.loaders:
+            raise RuntimeError('The "{0}" translation loader is not registered'.format(format))
+
+        if not isinstance(resource, str):
+            return self.loaders[format].load(resource, locale, domain)
+
+        # Stat the file before reading it - if it changes in the meantime, it will look changed later on
+        stamp = get_file_stamp(resource)
+        catalogue = self.loaders[format].load(resource, locale, domain)
+        self._record_stamp((format, resource, locale, domain), stamp)
+        return catalogue
+
+    def _record_stamp(self, key, stamp):
+        """
+        Remembers the stamp a file had when it was parsed into catalogues in use
+
+        @type key: tuple
+        @param key: (format, resource, locale, domain)
+        """
+        self._resource_stamps[key] = stamp
+        self._stamps_version += 1
+
+
+class FallbackIndex(object):
+    """
+    Messages of a domain with fallbacks resolved, see TranslatorMixin.get_fallback_index()
+
+    messages: {lowercased id: message} of the locale and all its fallbacks
+    locales: {lowercased id: locale} of messages found only in a fallback catalogue
+    last_locale: locale of the last fallback catalogue, where lookups of missing ids end
+    flattened: FlattenedMessages of the index, created by TranslatorMixin.get_flattened_domain()
+    """
+
+    __slots__ = ('messages', 'locales', 'last_locale', 'flattened')
+
+    def __init__(self, last_locale):
+        self.messages = {}
+        self.locales = {}
+        self.last_locale = last_locale
+        self.flattened = None
+
+
+class FlattenedMessages(object):
+    """
+    Messages of a fallback index formatted without parameters, see TranslatorMixin.get_flattened_domain()
+
+    messages: messages of the index, taken as they are unless they contain braces
+    formatted: {lowercased id: formatted message} of messages containing braces
+    """
+
+    __slots__ = ('messages', 'formatted')
+
+    def __init__(self, messages, formatted):
+        self.messages = messages
+        self.formatted = formatted
+
+    def get(self, id, default=None):
+        lower = id.lower()
+        message = self.messages.get(lower)
+        if message is None:
+            return default
+        if '{' in message or '}' in message:
+            return self.formatted.get(lower, default)
+        return message
+
+
+class FallbackIndexMixin(object):
+    """
+    Looks messages up in a fallback index (see TranslatorMixin.get_fallback_index()) instead
+    of walking the catalogue of a locale and its fallbacks on every call, see settings.TRANZ_FALLBACK_INDEX
+
+    A message missing in every catalogue costs a single dict lookup, just like one that's
+    found. Indexes hold only ids that exist, so looking up unknown ids never makes them grow.
+    Results are exactly the same as Translator's. Frozen domains have no index, their
+    messages are looked up in catalogues.
+    """
+
+    def _find_message(self, id, domain, locale):
+        index = self.get_fallback_index(domain, locale)
+        if index is None:
+            return super(FallbackIndexMixin, self)._find_message(id, domain, locale)
+
+        lower = id.lower()
+        msg = index.messages.get(lower)
+        if msg is None:
+            return id, index.last_locale
+        return msg, index.locales.get(lower, locale)
+
+
+class LazyMessageCatalogue(MessageCatalogue):
+    """
+    MessageCatalogue that parses resources of a domain the first time this domain is looked up.
+    Every domain is loaded only once, even if it's requested by many threads at the same time.
+
+    prepare_messages, if set, is called with (domain, messages) of every loaded domain
+    and returns the mapping the catalogue keeps.
+    """
+
+    prepare_messages = None
+
+    def __init__(self, locale, load_resource, resources):
+        """
+        @type load_resource: callable
+        @param load_resource: (format, resource, locale, domain) -> MessageCatalogue
+
+        @type resources: list
+        @param resources: A list of [format, resource, domain]
+        """
+        super(LazyMessageCatalogue, self).__init__(locale)
+        self._load_resource = load_resource
+        self._lock = threading.Lock()
+        self._pending = defaultdict(list)
+        for format, resource, domain in resources:
+            self._pending[domain].append((format, resource))
+        self._pending = dict(self._pending)
+
+    def load_domain(self, domain):
+        """
+        Parses all resources of given domain unless it's already done
+        """
+        if domain not in self._pending:
+            return
+
+        with self._lock:
+            # Another thread could have loaded the domain while we were waiting for the lock
+            resources = self._pending.get(domain)
+            if resources is None:
+                return
+
+            loaded = MessageCatalogue(self.locale)
+            for format, resource in resources:
+                merge_catalogue(loaded, self._load_resource(format, resource, self.locale, domain))
+
+            for resource in loaded.resources.values():
+                self.add_resource(resource)
+            messages = loaded.messages.get(domain, CaseInsensitiveDict())
+            if self.prepare_messages is not None:
+                messages = self.prepare_messages(domain, messages)
+            self.messages[domain] = messages
+            del self._pending[domain]
+
+    def load_all(self):
+        for domain in list(self._pending.keys()):
+            self.load_domain(domain)
+
+    def get_domains(self):
+        return list(set(self.messages.keys()) | set(self._pending.keys()))
+
+    def all(self, domain=None):
+        if domain is None:
+            self.load_all()
+        else:
+            self.load_domain(domain)
+        return super(LazyMessageCatalogue, self).all(domain)
+
+    def defines(self, id, domain='messages'):
+        self.load_domain(domain)
+        return super(LazyMessageCatalogue, self).defines(id, domain)
+
+
+class LazyLoadingMixin(TranslatorMixin):
+    """
+    Defers parsing of translation files until a (locale, domain) pair is actually used,
+    see settings.TRANZ_LAZY_LOADING
+    """
+
+    def get_catalogue(self, locale=None):
+        # Creating a lazy catalogue is cheap, but two threads must never end up with
+        # two different catalogues for the same locale (and parse the same files twice)
+        with self._catalogue_lock:
+            return super(LazyLoadingMixin, self).get_catalogue(locale)
+
+    def _create_catalogue(self, locale):
+        return LazyMessageCatalogue(locale, self._load_resource, self.resources.get(locale, []))
+
+    def reset_after_fork(self):
+        for catalogue in list(self.catalogues.values()):
+            if isinstance(catalogue, LazyMessageCatalogue):
+                catalogue._lock = threading.Lock()
+        super(LazyLoadingMixin, self).reset_after_fork()
+
+
+def get_file_stamp(path):
+    """
+    @rtype: tuple
+    @return: Something that changes whenever the file is modified or replaced, None if it does not exist
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class ReloadingMixin(TranslatorMixin):
+    """
+    Rebuilds catalogues of locales whose translation files changed, see settings.TRANZ_AUTO_RELOAD
+    and django_translate.reloading. reload_locales() parses only domains whose files changed since
+    they were loaded - messages of other domains are taken over from the previous catalogue as they are
+    (frozen or compact ones included) - and swaps rebuilt catalogues in at once.
+
+    prepare_catalogue, if set, is called with every rebuilt catalogue before it's swapped in.
+    """
+
+    prepare_catalogue = None
+
+    def __init__(self, *args, **kwargs):
+        self._reload_lock = threading.Lock()
+        # {(format, resource, locale, domain): messages} taken over by catalogues being rebuilt
+        self._reused_messages = {}
+        # {locale: {(format, resource, locale, domain): stamp}} of files parsed into catalogues being rebuilt
+        self._rebuilt_stamps = {}
+        super(ReloadingMixin, self).__init__(*args, **kwargs)
+
+    def reset_after_fork(self):
+        self._reload_lock = threading.Lock()
+        # A reload running in the parent at the time of the fork never finishes in the child
+        self._reused_messages = {}
+        self._rebuilt_stamps = {}
+        super(ReloadingMixin, self).reset_after_fork()
+
+    def get_catalogue(self, locale=None):
+        if locale is None:
+            locale = self.locale
+
+        # Loaded catalogues are never waited for, DebugTranslator reloads them on its own though
+        catalogues = self.catalogues
+        if locale in catalogues and not isinstance(self, DebugTranslator):
+            return catalogues[locale]
+
+        # Loading puts catalogues into self.catalogues, which must not be replaced by reload_locales() meanwhile
+        with self._catalogue_lock:
+            return super(ReloadingMixin, self).get_catalogue(locale)
+
+    def _load_resource(self, format, resource, locale, domain):
+        key = (format, resource, locale, domain)
+        if not isinstance(resource, str) or key not in self._reused_messages:
+            return super(ReloadingMixin, self)._load_resource(format, resource, locale, domain)
+
+        catalogue = MessageCatalogue(locale)
+        messages = self._reused_messages[key]
+        if messages is not None:
+            catalogue.messages[domain] = messages
+        catalogue.add_resource(resource)
+        return catalogue
+
+    def _record_stamp(self, key, stamp):
+        # Catalogues being rebuilt are not in use yet, their stamps are published when they are swapped in
+        stamps = self._rebuilt_stamps.get(key[2])
+        if stamps is None:
+            return super(ReloadingMixin, self)._record_stamp(key, stamp)
+        stamps[key] = stamp
+
+    def _get_unchanged_domains(self, catalogue):
+        """
+        @type catalogue: MessageCatalogue
+        @rtype: dict
+        @return: {(format, resource, locale, domain): messages} of loaded domains of catalogue whose files are all
+                 unchanged since they were parsed. Messages of a domain go with its first resource, None with others.
+        """
+        locale = catalogue.locale
+        by_domain = OrderedDict()
+        for format, resource, domain in self.resources.get(locale, []):
+            by_domain.setdefault(domain, []).append((format, resource, locale, domain))
+
+        reused = {}
+        for domain, keys in list(by_domain.items()):
+            messages = catalogue.messages.get(domain)
+            if messages is None:
+                continue
+
+            unchanged = True
+            for key in keys:
+                # Only files have stamps, anything else is loaded again
+                stamp = self._resource_stamps.get(key) if isinstance(key[1], str) else None
+                if stamp is None or stamp != get_file_stamp(key[1]):
+                    unchanged = False
+                    break
+            if unchanged:
+                reused.update((key, messages if i == 0 else None) for i, key in enumerate(keys))
+        return reused
+
+    def _rebuild_catalogue(self, previous):
+        """
+        Creates a catalogue of the same locale again, parsing only files which changed since it was loaded.
+        Domains which were in use are loaded right away, nobody has to wait for them later.
+
+        @type previous: MessageCatalogue
+        @rtype: MessageCatalogue
+        """
+        self._reused_messages = self._get_unchanged_domains(previous)
+        try:
+            catalogue = self._create_catalogue(previous.locale)
+            if isinstance(catalogue, LazyMessageCatalogue):
+                for domain in list(previous.messages.keys()):
+                    catalogue.load_domain(domain)
+            if self.prepare_catalogue is not None:
+                self.prepare_catalogue(catalogue)
+        finally:
+            self._reused_messages = {}
+        return catalogue
+
+    def reload_locales(self, locales):
+        """
+        Rebuilds catalogues of given locales, if they are loaded, and replaces all of them at once.
+        Catalogues falling back on them are linked to the new ones. Translations running
+        at the same time keep using the previous catalogues, they are never blocked.
+
+        @type locales: list
+        @rtype: list
+        @return: Locales whose catalogues were rebuilt
+        """
+        with self._reload_lock:
+            previous = self.catalogues
+            # Not used yet, they will be loaded from current files when needed
+            locales = [locale for locale in locales if locale in previous]
+            if not locales:
+                return []
+
+            self._rebuilt_stamps = dict((locale, {}) for locale in locales)
+            try:
+                return self._swap_catalogues(previous, locales)
+            finally:
+                self._rebuilt_stamps = {}
+
+    def _swap_catalogues(self, previous, locales):
+        # Files are parsed without holding the catalogue lock, loading other locales is not held up
+        rebuilt = OrderedDict()
+        for locale in locales:
+            rebuilt[locale] = self._rebuild_catalogue(previous[locale])
+
+        with self._catalogue_lock:
+            # Catalogues loaded while files were parsed are kept
+            catalogues = dict(self.catalogues)
+            catalogues.update(rebuilt)
+
+            # Same links as Translator._load_fallback_catalogues() creates, but made directly
+            # between complete catalogues, so a half-linked chain is never visible
+            for locale in list(catalogues.keys()):
+                fallbacks = self._compute_fallback_locales(locale)
+                if locale not in rebuilt and not set(fallbacks) & set(rebuilt):
+                    continue
+
+                current = catalogues[locale]
+                for fallback in fallbacks:
+                    if fallback not in catalogues:
+                        catalogues[fallback] = self._create_catalogue(fallback)
+                        if self.prepare_catalogue is not None:
+                            self.prepare_catalogue(catalogues[fallback])
+                    for resource in list(catalogues[fallback].resources):
+                        current.add_resource(resource)
+                    catalogues[fallback].parent = current
+                    current.fallback_catalogue = catalogues[fallback]
+                    current = catalogues[fallback]
+
+            for stamps in list(self._rebuilt_stamps.values()):
+                self._resource_stamps.update(stamps)
+            self.catalogues = catalogues
+            self._catalogues_changed()
+        return list(rebuilt.keys())
+
+
+class CompiledFormatMixin(object):
+    """
+    Formats messages using Interpolators compiled once per message, see settings.TRANZ_COMPILE_MESSAGES
+
+    Interpolators are indexed by message text: format() receives the text after all
+    fallbacks were resolved, and messages with the same text (in any locale or domain)
+    share a single compiled form. The cache is dropped whenever catalogues are reloaded.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._interpolators = {}
+        super(CompiledFormatMixin, self).__init__(*args, **kwargs)
+
+    def get_interpolator(self, message):
+        """
+        @type message: str
+        @rtype: Interpolator
+        """
+        interpolator = self._interpolators.get(message)
+        if interpolator is None:
+            if len(self._interpolators) >= MAX_INTERPOLATORS:
+                self._interpolators = {}
+            interpolator = self._interpolators[message] = Interpolator(message)
+        return interpolator
+
+    def format(self, msg, parameters):
+        return self.get_interpolator(msg).format(parameters)
+
+    def _catalogues_changed(self):
+        self._interpolators = {}
+        super(CompiledFormatMixin, self)._catalogues_changed()
+
+
+class CompiledPluralMixin(object):
+    """
+    Chooses plural forms using PluralSelectors compiled once per message and locale,
+    see settings.TRANZ_COMPILE_MESSAGES
+
+    Selectors are kept in a LRU cache of MAX_PLURAL_SELECTORS entries which is dropped
+    whenever catalogues are reloaded.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._plural_selectors = lru_cache(maxsize=MAX_PLURAL_SELECTORS)(PluralSelector)
+        super(CompiledPluralMixin, self).__init__(*args, **kwargs)
+
+    def get_plural_selector(self, message, locale):
+        """
+        @type message: str
+        @param message: Message with plural forms, e.g. "{0} No apples|{1} One apple|]1,Inf] {count} apples"
+
+        @type locale: str
+        @param locale: Locale the message comes from
+
+        @rtype: PluralSelector
+        """
+        return self._plural_selectors(message, locale)
+
+    def select_plural(self, message, number, locale):
+        return self.get_plural_selector(message, locale).select(number)
+
+    def _catalogues_changed(self):
+        self._plural_selectors.cache_clear()
+        super(CompiledPluralMixin, self)._catalogues_changed()
+
+
+class ResultCache(object):
+    """
+    Least recently used results of trans() and transchoice(), bounded by number of entries
+    and optionally by memory taken by the results
+    """
+
+    def __init__(self, max_entries, max_bytes=None):
+        """
+        @type max_entries: int
+        @type max_bytes: int
+        @param max_bytes: Total size of cached results (see sys.getsizeof()), None for no limit
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        @rtype: str
+        @return: Cached result, None if there is none
+        """
+        # Lock-free: single OrderedDict operations are atomic, and counts missed by racing threads don't matter
+        results = self._results
+        entry = results.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        try:
+            results.move_to_end(key)
+        except KeyError:
+            # Evicted by another thread meanwhile
+            pass
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key, result):
+        size = sys.getsizeof(result)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._results.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._results[key] = (result, size)
+            self.bytes += size
+            while len(self._results) > self.max_entries or \
+                    (self.max_bytes is not None and self.bytes > self.max_bytes):
+                _, (_, evicted) = self._results.popitem(last=False)
+                self.bytes -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._results = OrderedDict()
+            self.bytes = 0
+
+    def info(self):
+        """
+        @rtype: dict
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._results),
+            "bytes": self.bytes,
+        }
+
+    def __len__(self):
+        return len(self._results)
+
+
+# Parameters of other types may format differently while being equal, or change without changing their hash
+CACHEABLE_PARAMETER_TYPES = (str, int, float, type(None))
+
+
+def get_parameters_key(parameters):
+    """
+    @rtype: tuple
+    @return: Hashable form of parameters, None if any of them must not be cached
+    """
+    if not parameters:
+        return ()
+
+    for value in parameters.values():
+        if not isinstance(value, CACHEABLE_PARAMETER_TYPES):
+            return None
+    # 1, 1.0 and True are equal, but they are formatted differently
+    return tuple(sorted([(name, value, value.__class__) for name, value in parameters.items()]))
+
+
+class ResultCacheMixin(object):
+    """
+    Caches results of trans() and transchoice() calls in translator.result_cache, see
+    settings.TRANZ_RESULT_CACHE_SIZE. Calls with parameters of other types than strings, numbers
+    or None are not cached. The cache is cleared whenever catalogues are reloaded.
+    """
+
+    result_cache = None
+
+    def trans(self, id, parameters=None, domain=None, locale=None):
+        cache = self.result_cache
+        parameters_key = get_parameters_key(parameters) if cache is not None else None
+        if parameters_key is None:
+            return super(ResultCacheMixin, self).trans(id, parameters, domain, locale)
+
+        key = (id, None, parameters_key, domain or 'messages', locale or self.locale)
+        result = cache.get(key)
+        if result is None:
+            version = self.catalogues_version
+            result = super(ResultCacheMixin, self).trans(id, parameters, domain, locale)
+            if version == self.catalogues_version:
+                cache.set(key, result)
+        return result
+
+    def transchoice(self, id, number, parameters=None, domain=None, locale=None):
+        cache = self.result_cache
+        parameters_key = get_parameters_key(parameters) if cache is not None else None
+        if parameters_key is None or not isinstance(number, CACHEABLE_PARAMETER_TYPES):
+            return super(ResultCacheMixin, self).transchoice(id, number, parameters, domain, locale)
+
+        key = (id, (number, number.__class__), parameters_key, domain or 'messages', locale or self.locale)
+        result = cache.get(key)
+        if result is None:
+            version = self.catalogues_version
+            result = super(ResultCacheMixin, self).transchoice(id, number, parameters, domain, locale)
+            if version == self.catalogues_version:
+                cache.set(key, result)
+        return result
+
+    def _catalogues_changed(self):
+        if self.result_cache is not None:
+            self.result_cache.clear()
+        super(ResultCacheMixin, self)._catalogues_changed()
+
+    def reset_after_fork(self):
+        if self.result_cache is not None:
+            self.result_cache._lock = threading.Lock()
+        super(ResultCacheMixin, self).reset_after_fork()
+
+
+class _ThreadLocalVar(object):
+    """
+    Minimal stand-in for contextvars.ContextVar on pythons older than 3.7
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._local = threading.local()
+
+    def get(self, default=None):
+        return getattr(self._local, "value", default)
+
+    def set(self, value):
+        token = (self.get(), )
+        self._local.value = value
+        return token
+
+    def reset(self, token):
+        self._local.value = token[0]
+
+
+class ContextLocaleMixin(object):
+    """
+    Keeps the current locale in a context variable instead of a translator attribute,
+    so that every thread (or asyncio task) may use a different locale at the same time.
+
+    translator.locale still works as before: assigning it sets the default locale
+    used wherever no locale was activated.
+    """
+
+    def __init__(self, *args, **kwargs):
+        var_class = ContextVar if ContextVar is not None else _ThreadLocalVar
+        self._active_locale = var_class("tranz_locale_{0}".format(id(self)))
+        self._default_locale = None
+        super(ContextLocaleMixin, self).__init__(*args, **kwargs)
+
+    @property
+    def locale(self):
+        return self._active_locale.get(None) or self._default_locale
+
+    @locale.setter
+    def locale(self, value):
+        self._assert_valid_locale(value)
+        self._default_locale = value
+
+    def activate(self, locale):
+        """
+        Sets the locale of current context (thread, request or asyncio task)
+
+        @type locale: str
+        @return: A token to be passed to deactivate()
+        """
+        self._assert_valid_locale(locale)
+        return self._active_locale.set(locale)
+
+    def deactivate(self, token):
+        """
+        Restores the locale that was active before activate() returned given token
+        """
+        self._active_locale.reset(token)
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Recording of messages looked up at runtime, see settings.TRANZ_USAGE_DIR and the tranztrim command
+
+Every process counts (locale, domain, id) keys it translates in a plain dict - no locks, an
+increment lost now and then by racing threads does not matter, only whether a key was used
+at all does. A daemon thread periodically writes all counts of the process into its own
+file, usage-{host}-{pid}.json, replacing it atomically. Keys beyond max_keys are not
+recorded, so memory stays bounded even if ids are built from user input.
+"""
+
+import os
+import json
+import atexit
+import socket
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+USAGE_FILE_VERSION = 1
+
+
+class UsageRecorder(object):
+
+    def __init__(self, directory, interval=60, max_keys=1000000):
+        """
+        @type directory: str
+        @param directory: Where recordings are written to
+
+        @type interval: float
+        @param interval: How often counts are written, in seconds
+
+        @type max_keys: int
+        @param max_keys: At most that many keys are counted by a process
+        """
+        self.directory = directory
+        self.interval = interval
+        self.max_keys = max_keys
+        self.counts = {}
+        self.dropped = 0
+        self._thread = None
+        self._stopped = threading.Event()
+        self._flush_lock = threading.Lock()
+
+    def record(self, locale, domain, id):
+        key = (locale, domain, id)
+        counts = self.counts
+        count = counts.get(key)
+        if count is not None:
+            counts[key] = count + 1
+        elif len(counts) < self.max_keys:
+            counts[key] = 1
+        else:
+            self.dropped += 1
+
+    def get_path(self):
+        return os.path.join(self.directory, "usage-{0}-{1}.json".format(socket.gethostname(), os.getpid()))
+
+    def flush(self):
+        """
+        Writes counts of this process to its usage file
+        """
+        with self._flush_lock:
+            counts = [[locale, domain, id, count] for (locale, domain, id), count in list(self.counts.items())]
+            if not counts:
+                return
+
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+
+            path = self.get_path()
+            tmp_path = "{0}.tmp".format(path)
+            with open(tmp_path, "w") as f:
+                json.dump({"version": USAGE_FILE_VERSION, "dropped": self.dropped, "counts": counts}, f)
+            os.replace(tmp_path, path)
+
+    def start(self):
+        """
+        Starts flushing counts periodically in a daemon thread, and once more at exit
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="django_translate usage recorder")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._flush()
+
+    def restart_after_fork(self):
+        """
+        A forked process starts with counts of its parent, which are written by the parent
+        """
+        self.counts = {}
+        self.dropped = 0
+        # Locks held by threads of the parent at the time of the fork stay held forever in the child
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        if self._thread is not None:
+            self._thread = None
+            self.start()
+
+    def _flush(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Failed to write translation usage to %s", self.directory)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self._flush()
+
+
+def read_usage(directory):
+    """
+    Merges recordings of all processes
+
+    @type directory: str
+    @rtype: dict
+    @return: {(locale, domain, id): count}
+    """
+    counts = {}
+    if not os.path.isdir(directory):
+        return counts
+
+    for name in sorted(os.listdir(directory)):
+        if not (name.startswith("usage-") and name.endswith(".json")):
+            continue
+        with open(os.path.join(directory, name)) as f:
+            data = json.load(f)
+        if data.get("version") != USAGE_FILE_VERSION:
+            continue
+        for locale, domain, id, count in data["counts"]:
+            key = (locale, domain, id)
+            counts[key] = counts.get(key, 0) + count
+    return counts
+
+
+class UsageRecordingMixin(object):
+    """
+    Records every message looked up by trans() and transchoice() in translator.usage_recorder
+    """
+
+    usage_recorder = None
+
+    def trans(self, id, parameters=None, domain=None, locale=None):
+        self.usage_recorder.record(locale or self.locale, domain or 'messages', id)
+        return super(UsageRecordingMixin, self).trans(id, parameters, domain, locale)
+
+    def transchoice(self, id, number, parameters=None, domain=None, locale=None):
+        self.usage_recorder.record(locale or self.locale, domain or 'messages', id)
+        return super(UsageRecordingMixin, self).transchoice(id, number, parameters, domain, locale)
+
+
+def record_gettext(recorder, translate_into):
+    """
+    Wraps services.monkeypatch_django()'s translate_into(locale, message), which serves
+    most messages without calling translator.trans()
+    """
+    def wrapper(locale, message):
+        recorder.record(locale, 'django', message)
+        return translate_into(locale, message)
+    return wrapper
+
+
+def start_recorder(recorder):
+    recorder.start()
+    atexit.register(recorder.stop)
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=recorder.restart_after_fork)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Writing of translation files by the tranzdump command
+
+python_translate's FileDumper rewrites (and backs up) the file of every domain of a catalogue.
+write_translations() renders each domain the same way, but writes only files whose content
+would change, each of them through a temporary file replacing the original at once - a reader
+never sees a half written file.
+"""
+
+import os
+import shutil
+
+from python_translate.dumpers import FileDumper
+
+
+class WriteStats(object):
+    """
+    What write_translations() did
+    """
+
+    def __init__(self):
+        self.written = []
+        self.skipped = []
+        self.bytes_written = 0
+
+    def update(self, stats):
+        self.written += stats.written
+        self.skipped += stats.skipped
+        self.bytes_written += stats.bytes_written
+
+
+def _read(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def write_file(path, data, backup=False):
+    """
+    Atomically replaces contents of a file
+
+    @type data: bytes
+    @type backup: bool
+    @param backup: Keep previous contents in path~, the way FileDumper does
+    """
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    if backup and os.path.isfile(path):
+        shutil.copyfile(path, path + "~")
+
+    tmp_path = "{0}.{1}.tmp".format(path, os.getpid())
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        if os.path.isfile(path):
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_translations(writer, catalogue, format, path):
+    """
+    Writes files of domains whose content differs from what is already there
+
+    @type writer: python_translate.glue.TranslationWriter
+    @type catalogue: MessageCatalogue
+
+    @type format: str
+    @param format: One of writer.get_formats()
+
+    @type path: str
+    @param path: Directory of translation files
+
+    @rtype: WriteStats
+    @raises: ValueError
+    """
+    if format not in writer.dumpers:
+        raise ValueError('There is no dumper associated with format "{0}"'.format(format))
+
+    dumper = writer.dumpers[format]
+    stats = WriteStats()
+    if not isinstance(dumper, FileDumper):
+        # No idea where it writes to, let it do its job
+        writer.write_translations(catalogue, format, {"path": path, "default_locale": catalogue.locale})
+        return stats
+
+    for domain in sorted(catalogue.get_domains()):
+        full_path = os.path.join(path, dumper.get_relative_path(domain, catalogue.locale))
+        data = dumper.format(catalogue, domain)
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+
+        if _read(full_path) == data:
+            stats.skipped.append(full_path)
+            continue
+
+        write_file(full_path, data, backup=dumper.backup)
+        stats.written.append(full_path)
+        stats.bytes_written += len(data)
+    return stats